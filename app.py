@@ -5,13 +5,54 @@ Flask Web Application — Interactive dashboard for the Notification Prioritizat
 import json
 import os
 import sys
+from collections import Counter
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, abort, jsonify
+from flask.json.provider import DefaultJSONProvider
 from decision_engine import DecisionEngine
+from config import BATCH_MAX_WORKERS
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback when orjson is not installed
+    orjson = None
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # ASGI serving is optional; the Flask dev server still works
+    WsgiToAsgi = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, so every jsonify() call uses it."""
+
+    def _options(self, indent: bool = False) -> int:
+        # Datetimes go through self.default (http_date), as with Flask's own provider
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
 # Global engine instance
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,17 +61,44 @@ EVENTS_PATH = os.path.join(BASE_DIR, "test_events.json")
 
 engine = DecisionEngine(rules_path=RULES_PATH)
 
+# Parsed rules.json, reused by GET /api/rules until the file's mtime changes
+_rules_cache = {"mtime": None, "data": None}
+
+# ASGI entry point for production serving: uvicorn app:asgi_app --port 5000
+asgi_app = WsgiToAsgi(app) if WsgiToAsgi is not None else None
+
 
 def load_json_file(path):
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def save_json_file(path, data):
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
 
 
+def _json_in():
+    """Parse the request body as JSON without Werkzeug caching the raw bytes."""
+    body = request.get_data(cache=False) or b"{}"
+    try:
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError:
+        abort(400, description="Request body is not valid JSON")
+
+
+def _ndjson_line(obj) -> bytes:
+    """One NDJSON record, serialized by app.json like every jsonify() response."""
+    return app.json.dumps(obj).encode("utf-8") + b"\n"
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -40,7 +108,7 @@ def index():
 def process_events():
     """Process a batch of notification events."""
     global engine
-    data = request.get_json()
+    data = _json_in()
     events = data.get("events", [])
 
     if not events:
@@ -49,33 +117,69 @@ def process_events():
     # Reset engine state for fresh processing
     engine.reset()
 
-    results = engine.process_batch(events)
+    results = engine.process_batch(events, max_workers=BATCH_MAX_WORKERS)
     logs = engine.logger.logs
 
+    counts = Counter(r["decision"] for r in results)
+
     return jsonify({
         "results": results,
         "logs": logs,
         "summary": {
             "total": len(results),
-            "now": sum(1 for r in results if r["decision"] == "NOW"),
-            "later": sum(1 for r in results if r["decision"] == "LATER"),
-            "never": sum(1 for r in results if r["decision"] == "NEVER"),
+            "now": counts["NOW"],
+            "later": counts["LATER"],
+            "never": counts["NEVER"],
         }
     })
 
 
+@app.route("/api/process/stream", methods=["POST"])
+def process_events_stream():
+    """
+    Process a batch of notification events, streaming one output record per
+    line (NDJSON) as each is decided, followed by a trailing summary line.
+    """
+    data = _json_in()
+    events = data.get("events", [])
+
+    if not events:
+        return jsonify({"error": "No events provided"}), 400
+
+    # Reset engine state for fresh processing
+    engine.reset()
+
+    def generate():
+        counts = Counter()
+        for raw_event in events:
+            result = engine.process_event(raw_event)
+            counts[result["decision"]] += 1
+            yield _ndjson_line(result)
+        yield _ndjson_line({"summary": {
+            "total": len(events),
+            "now": counts["NOW"],
+            "later": counts["LATER"],
+            "never": counts["NEVER"],
+        }})
+
+    return app.response_class(generate(), mimetype="application/x-ndjson")
+
+
 @app.route("/api/rules", methods=["GET"])
 def get_rules():
     """Get current rules."""
-    rules_data = load_json_file(RULES_PATH)
-    return jsonify(rules_data)
+    mtime = os.stat(RULES_PATH).st_mtime_ns
+    if _rules_cache["mtime"] != mtime:
+        _rules_cache["data"] = load_json_file(RULES_PATH)
+        _rules_cache["mtime"] = mtime
+    return jsonify(_rules_cache["data"])
 
 
 @app.route("/api/rules", methods=["POST"])
 def update_rules():
     """Update rules at runtime."""
     global engine
-    data = request.get_json()
+    data = _json_in()
 
     try:
         # Validate structure
@@ -85,6 +189,8 @@ def update_rules():
 
         # Save to file
         save_json_file(RULES_PATH, data)
+        _rules_cache["data"] = data
+        _rules_cache["mtime"] = os.stat(RULES_PATH).st_mtime_ns
 
         # Reload engine rules
         engine.reload_rules(rules_path=RULES_PATH)
@@ -105,7 +211,7 @@ def get_test_events():
 def simulate_failure():
     """Toggle LLM failure simulation."""
     global engine
-    data = request.get_json()
+    data = _json_in()
     enabled = data.get("enabled", False)
     engine.set_llm_failure(enabled)
     return jsonify({
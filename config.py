@@ -7,11 +7,13 @@ DEDUPE_WINDOW_MINUTES = 10
 
 # ── Near-Duplicate Threshold ───────────────────────────────────────────
 TEXT_SIMILARITY_THRESHOLD = 0.9  # normalized Levenshtein ratio
+QGRAM_SIZE = 3                   # character q-grams for candidate pre-filtering
 
 # ── Alert Fatigue / Frequency ──────────────────────────────────────────
 FREQUENCY_WINDOW_MINUTES = 10
 FREQUENCY_LIMIT = 5              # ≥ this many in window → downgrade
 HISTORY_BUFFER_SIZE = 30         # ring buffer size per user
+HISTORY_SHARD_COUNT = 16         # lock stripes in ShardedHistoryStore
 
 # ── Conflict / Noise Limits ───────────────────────────────────────────
 NOISE_LIMIT_MAX_URGENT = 2       # M urgent of same type/source allowed
@@ -26,8 +28,30 @@ QUIET_RESUME_HOUR = 8  # schedule LATER at 8 AM
 BASE_BACKOFF_MINUTES = 5
 DEFAULT_WORKING_HOUR = 9  # for reminders
 
+# ── Rules ──────────────────────────────────────────────────────────
+RULE_MATCH_CACHE_SIZE = 4096  # memoized match() results, keyed by the fields rules read
+
+# ── Batch Processing ───────────────────────────────────────────────
+BATCH_MAX_WORKERS = 4  # per-user shards processed concurrently in a batch
+
+# ── Email (IMAP) ───────────────────────────────────────────────────
+IMAP_IDLE_TIMEOUT = 25 * 60  # re-issue IDLE before the 29-minute server cutoff (RFC 2177)
+IDLE_SAFETY_POLLS = 4        # web app: leave IDLE and fetch after this many poll intervals anyway
+POLL_BACKOFF_FACTOR = 1.5    # without IDLE, each empty poll stretches the interval by this
+POLL_BACKOFF_MAX_SECONDS = 60  # ...up to this cap; new mail resets it
+FETCH_BATCH_SIZE = 100       # message ids per ranged FETCH/STORE command
+FETCH_BODY_BYTES = 8192      # leading body bytes fetched per message (partial FETCH)
+MAX_EMAIL_BYTES = 1 << 20    # raw messages are truncated to this before parsing
+MAX_HEADER_SEMICOLONS = 1000 # above this, ';' runs in the header block are collapsed
+MEETING_SCAN_CHARS = 10_000  # body prefix scanned for meeting details
+
+# ── Decision Log ───────────────────────────────────────────────────
+DECISION_LOG_PATH = "decisions.jsonl"  # JSON Lines sink used by the web app
+DECISION_LOG_BUFFER_SIZE = 1000        # entries kept in memory when a sink is set
+
 # ── LLM ────────────────────────────────────────────────────────────────
 LLM_TIMEOUT_SECONDS = 2
+LLM_CACHE_SIZE = 2048  # memoized classifications keyed by classifier inputs
 
 # ── Fallback Mapping ──────────────────────────────────────────────────
 FALLBACK_MAP = {
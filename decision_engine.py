@@ -6,10 +6,13 @@ Pipeline per event:
 → 5. Frequency/fatigue check → 6. Conflict resolution → 7. Schedule → 8. Log
 """
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from input_validator import validate_event, ValidationError
 from duplicate_detector import DuplicateDetector, normalize_text
-from history_store import HistoryStore
+from history_store import ShardedHistoryStore
 from rule_engine import RuleEngine
 from llm_classifier import LLMClassifier
 from scheduler import compute_scheduled_time
@@ -17,6 +20,7 @@ from logger import DecisionLogger
 from config import (
     FREQUENCY_WINDOW_MINUTES, FREQUENCY_LIMIT,
     NOISE_LIMIT_MAX_URGENT, NOISE_LIMIT_WINDOW_MINUTES,
+    LLM_CACHE_SIZE, DECISION_LOG_BUFFER_SIZE,
 )
 
 
@@ -24,18 +28,23 @@ class DecisionEngine:
     """Processes notification events and produces prioritized decisions."""
 
     def __init__(self, rules_path: str = None, rules_data: list = None,
-                 simulate_llm_failure: bool = False):
-        self.history = HistoryStore()
+                 simulate_llm_failure: bool = False, log_path: str = None):
+        self.history = ShardedHistoryStore()
         self.dedup = DuplicateDetector(self.history)
         self.rules = RuleEngine(rules_path=rules_path, rules_data=rules_data)
         self.llm = LLMClassifier(simulate_failure=simulate_llm_failure)
-        self.logger = DecisionLogger()
+        self.logger = DecisionLogger(log_path=log_path, max_entries=DECISION_LOG_BUFFER_SIZE)
+        self._llm_cache = lru_cache(maxsize=LLM_CACHE_SIZE)(self._llm_classify_raw)
 
     def process_event(self, raw_event: dict) -> dict:
         """
         Process a single notification event through the full pipeline.
         Returns the output record dict.
         """
+        return self._process_event(raw_event, self.logger)
+
+    def _process_event(self, raw_event: dict, logger: DecisionLogger) -> dict:
+        """Run the pipeline for one event, writing its audit entry to logger."""
         # ── Step 1: Validate ──────────────────────────────────────────
         try:
             event = validate_event(raw_event)
@@ -50,8 +59,20 @@ class DecisionEngine:
             }
             return error_record
 
+        # Bind hot attributes once; they are used several times below
+        history = self.history
+        rules = self.rules
+        user_id = event["user_id"]
+        # One clock read per event, shared by every windowed history query
+        now = datetime.now(timezone.utc)
+
+        # Normalized text is shared by dedup and history; compute it once
+        event["_normalized_text"] = normalize_text(
+            (event.get("title", "") + " " + event.get("message", "")).strip()
+        )
+
         # ── Step 2: Check duplicates ──────────────────────────────────
-        dup_result = self.dedup.check(event)
+        dup_result = self.dedup.check(event, now)
         if dup_result["is_duplicate"]:
             decision = "NEVER"
             explanation_code = dup_result["duplicate_type"]
@@ -59,14 +80,17 @@ class DecisionEngine:
                 f"Duplicate suppressed: {dup_result['duplicate_type']} "
                 f"(matched {dup_result['matched_event_id'][:8] if dup_result['matched_event_id'] else 'unknown'})"
             )
-            log_entry = self.logger.log(
+            log_entry = logger.log(
                 event, decision, None, explanation_code, reason
             )
             self._record_history(event, decision, explanation_code)
-            return self.logger.get_output_record(event, log_entry)
+            return logger.get_output_record(event, log_entry)
 
         # ── Step 3: LLM classification ────────────────────────────────
-        llm_result = self.llm.classify(event)
+        llm_result = self._llm_cache(
+            event["event_type"], event.get("priority_hint"), event["channel"],
+            event.get("title", ""), event["message"],
+        )
         current_decision = llm_result["label"]
         explanation_code = llm_result["explanation_code"]
         confidence = llm_result["confidence"]
@@ -74,12 +98,12 @@ class DecisionEngine:
         reason = raw_output
 
         # ── Step 4: Apply human rules ─────────────────────────────────
-        matched_rules = self.rules.match(event)
+        matched_rules = rules.match(event)
         matched_rule_id = None
 
         if matched_rules:
-            rule_result = self.rules.apply_actions(
-                event, matched_rules, current_decision, self.history
+            rule_result = rules.apply_actions(
+                event, matched_rules, current_decision, history, now
             )
             if rule_result["explanation_code"]:
                 current_decision = rule_result["decision"]
@@ -88,31 +112,29 @@ class DecisionEngine:
                 reason = rule_result["reason"]
 
         # ── Step 5: Frequency / alert fatigue ─────────────────────────
-        freq_count = self.history.count_in_window(
-            event["user_id"], FREQUENCY_WINDOW_MINUTES
-        )
+        freq_count = history.count_in_window(user_id, FREQUENCY_WINDOW_MINUTES, now)
 
         if freq_count >= FREQUENCY_LIMIT:
             if current_decision == "NOW":
                 current_decision = "LATER"
                 explanation_code = "FREQUENCY_LIMIT"
                 reason = (
-                    f"Downgraded NOW→LATER: user {event['user_id']} received "
+                    f"Downgraded NOW→LATER: user {user_id} received "
                     f"{freq_count} notifications in last {FREQUENCY_WINDOW_MINUTES} min"
                 )
             elif current_decision == "LATER" and freq_count >= FREQUENCY_LIMIT + 2:
                 current_decision = "NEVER"
                 explanation_code = "FREQUENCY_SUPPRESSION"
                 reason = (
-                    f"Suppressed: user {event['user_id']} received "
+                    f"Suppressed: user {user_id} received "
                     f"{freq_count} notifications (fatigue threshold)"
                 )
 
         # ── Step 6: Conflict / noise resolution ──────────────────────
         if current_decision == "NOW":
-            urgent_count = self.history.count_urgent_by_source_or_type(
-                event["user_id"], event["event_type"],
-                event.get("source", ""), NOISE_LIMIT_WINDOW_MINUTES
+            urgent_count = history.count_urgent_by_source_or_type(
+                user_id, event["event_type"],
+                event.get("source", ""), NOISE_LIMIT_WINDOW_MINUTES, now
             )
             if urgent_count >= NOISE_LIMIT_MAX_URGENT:
                 current_decision = "LATER"
@@ -136,7 +158,7 @@ class DecisionEngine:
                 scheduled_time = sched
 
         # ── Step 8: Log ───────────────────────────────────────────────
-        log_entry = self.logger.log(
+        log_entry = logger.log(
             event, current_decision, scheduled_time,
             explanation_code, reason,
             matched_rule_id=matched_rule_id,
@@ -145,11 +167,51 @@ class DecisionEngine:
         )
         self._record_history(event, current_decision, explanation_code)
 
-        return self.logger.get_output_record(event, log_entry)
+        return logger.get_output_record(event, log_entry)
 
-    def process_batch(self, events: list[dict]) -> list[dict]:
-        """Process a batch of events and return all output records."""
-        return [self.process_event(e) for e in events]
+    def process_batch(self, events: list[dict], max_workers: int = 1) -> list[dict]:
+        """
+        Process a batch of events and return all output records.
+
+        With max_workers > 1 the batch is sharded by user_id and shards run
+        concurrently. All dedup/fatigue state is per user, so ordering within
+        a user is preserved and the results match serial processing.
+        """
+        process, logger = self._process_event, self.logger
+        if max_workers <= 1:
+            return [process(e, logger) for e in events]
+
+        shards = defaultdict(list)
+        for index, raw_event in enumerate(events):
+            user_id = raw_event.get("user_id") if isinstance(raw_event, dict) else None
+            shards[str(user_id)].append((index, raw_event))
+        if len(shards) < 2:
+            return [process(e, logger) for e in events]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as pool:
+            shard_outputs = list(pool.map(self._process_shard, shards.values()))
+
+        # Reassemble records and audit logs in the original batch order
+        records = [None] * len(events)
+        log_entries = [None] * len(events)
+        for shard_output in shard_outputs:
+            for index, record, entries in shard_output:
+                records[index] = record
+                log_entries[index] = entries
+        for entries in log_entries:
+            logger.extend(entries)
+        return records
+
+    def _process_shard(self, shard: list[tuple[int, dict]]) -> list[tuple[int, dict, list]]:
+        """Process one user's events in order with a private logger."""
+        shard_logger = DecisionLogger()
+        process, shard_logs = self._process_event, shard_logger.logs
+        output = []
+        for index, raw_event in shard:
+            start = len(shard_logs)
+            record = process(raw_event, shard_logger)
+            output.append((index, record, shard_logs[start:]))
+        return output
 
     def _record_history(self, event: dict, decision: str, explanation_code: str):
         """Add event to history store for future dedup/frequency checks."""
@@ -160,16 +222,26 @@ class DecisionEngine:
             "decision": decision,
             "explanation_code": explanation_code,
             "dedupe_key": event.get("dedupe_key"),
-            "normalized_text": normalize_text(
-                (event.get("title", "") + " " + event.get("message", "")).strip()
-            ),
+            "normalized_text": event["_normalized_text"],
             "parsed_timestamp": event.get("parsed_timestamp"),
             "timestamp": event.get("timestamp"),
         })
 
+    def _llm_classify_raw(self, event_type: str, priority_hint: str | None,
+                          channel: str, title: str, message: str) -> dict:
+        """Classify from exactly the fields the LLM reads (memoized via _llm_cache)."""
+        return self.llm.classify({
+            "event_type": event_type,
+            "priority_hint": priority_hint,
+            "channel": channel,
+            "title": title,
+            "message": message,
+        })
+
     def set_llm_failure(self, enabled: bool):
         """Toggle LLM failure simulation."""
         self.llm.set_failure_mode(enabled)
+        self._llm_cache.cache_clear()
 
     def reload_rules(self, rules_path: str = None, rules_data: list = None):
         """Reload rules without restarting."""
@@ -179,3 +251,4 @@ class DecisionEngine:
         """Reset all state (history + logs)."""
         self.history.clear()
         self.logger.clear()
+        self._llm_cache.cache_clear()
@@ -4,15 +4,29 @@ Duplicate Detector — exact dedupe_key matching and near-duplicate text similar
 
 import re
 import unicodedata
-from config import DEDUPE_WINDOW_MINUTES, TEXT_SIMILARITY_THRESHOLD
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from config import DEDUPE_WINDOW_MINUTES, TEXT_SIMILARITY_THRESHOLD, QGRAM_SIZE
 
+try:
+    from rapidfuzz import process as rf_process
+    from rapidfuzz.distance import Levenshtein as rf_levenshtein
+except ImportError:  # fall back to the pure-Python Myers implementation below
+    rf_process = None
+    rf_levenshtein = None
 
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
     """Normalize text: lowercase, strip punctuation, collapse whitespace."""
     text = text.lower()
     text = unicodedata.normalize("NFKD", text)
-    text = re.sub(r'[^\w\s]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _PUNCT_RE.sub('', text)
+    text = _WS_RE.sub(' ', text).strip()
     return text
 
 
@@ -23,30 +37,73 @@ def levenshtein_ratio(s1: str, s2: str) -> float:
     if not s1 or not s2:
         return 0.0
 
+    if rf_levenshtein is not None:
+        # C implementation; score_cutoff lets it bail out early below threshold
+        return rf_levenshtein.normalized_similarity(
+            s1, s2, score_cutoff=TEXT_SIMILARITY_THRESHOLD
+        )
+
     len1, len2 = len(s1), len(s2)
 
     # Quick length-based rejection
     if abs(len1 - len2) / max(len1, len2) > (1 - TEXT_SIMILARITY_THRESHOLD):
         return 0.0
 
-    # Dynamic programming Levenshtein
-    matrix = list(range(len2 + 1))
-    for i in range(1, len1 + 1):
-        prev = matrix[0]
-        matrix[0] = i
-        for j in range(1, len2 + 1):
-            temp = matrix[j]
-            if s1[i - 1] == s2[j - 1]:
-                matrix[j] = prev
-            else:
-                matrix[j] = 1 + min(prev, matrix[j], matrix[j - 1])
-            prev = temp
-
-    distance = matrix[len2]
+    distance = _myers_distance(s1, s2)
     max_len = max(len1, len2)
     return 1.0 - (distance / max_len)
 
 
+def _myers_distance(s1: str, s2: str) -> int:
+    """
+    Levenshtein distance via Myers/Hyyrö bit-parallel DP: each column of the
+    DP matrix is a pair of int bit-vectors, so the inner loop over s1 runs
+    as a handful of big-int operations instead of len(s1) Python steps.
+    """
+    m = len(s1)
+    peq: dict[str, int] = {}
+    for i, ch in enumerate(s1):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    high_bit = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for ch in s2:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high_bit:
+            score += 1
+        elif mh & high_bit:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+
+def text_qgrams(text: str) -> Counter:
+    """Multiset of overlapping character q-grams of a normalized text."""
+    return Counter(text[i:i + QGRAM_SIZE] for i in range(len(text) - QGRAM_SIZE + 1))
+
+
+def qgram_candidate(len1: int, grams1: Counter, len2: int, grams2: Counter,
+                    threshold: float = TEXT_SIMILARITY_THRESHOLD) -> bool:
+    """
+    q-gram lemma filter: strings within k edits share at least
+    max_len - q + 1 - k*q q-grams. Never rejects a true near-duplicate.
+    """
+    max_len = max(len1, len2)
+    max_edits = int((1 - threshold) * max_len + 1e-9)
+    required = max_len - QGRAM_SIZE + 1 - QGRAM_SIZE * max_edits
+    if required <= 0:
+        return True
+    return sum((grams1 & grams2).values()) >= required
+
+
 class DuplicateDetector:
     """Detects exact and near-duplicate notifications."""
 
@@ -56,9 +113,10 @@ class DuplicateDetector:
         self.dedupe_window = dedupe_window
         self.similarity_threshold = similarity_threshold
 
-    def check(self, event: dict) -> dict:
+    def check(self, event: dict, now: datetime | None = None) -> dict:
         """
-        Check if event is a duplicate.
+        Check if event is a duplicate. now ends the dedupe window (defaults
+        to the current time), so one event's queries share a single clock read.
         Returns:
           {
             "is_duplicate": bool,
@@ -67,11 +125,16 @@ class DuplicateDetector:
           }
         """
         user_id = event["user_id"]
+        event_text = event.get("_normalized_text")
+        if event_text is None:
+            event_text = normalize_text(
+                (event.get("title", "") + " " + event.get("message", "")).strip()
+            )
 
         # 1. Exact dedupe_key check
         if event.get("dedupe_key"):
             matches = self.history.get_dedupe_key_entries(
-                user_id, event["dedupe_key"], self.dedupe_window
+                user_id, event["dedupe_key"], self.dedupe_window, now
             )
             if matches:
                 return {
@@ -81,22 +144,45 @@ class DuplicateDetector:
                 }
 
         # 2. Near-duplicate text similarity
-        event_text = normalize_text(
-            (event.get("title", "") + " " + event.get("message", "")).strip()
-        )
         if event_text:
-            past_entries = self.history.get_text_entries(user_id, self.dedupe_window)
-            for entry in past_entries:
-                ratio = levenshtein_ratio(event_text, entry["normalized_text"])
-                if ratio >= self.similarity_threshold:
-                    return {
-                        "is_duplicate": True,
-                        "duplicate_type": "DUPLICATE_TEXT_SIMILAR",
-                        "matched_event_id": entry.get("event_id"),
-                    }
+            past_entries = self.history.get_text_entries(user_id, self.dedupe_window, now)
+            similar = self._find_similar(event_text, past_entries)
+            if similar is not None:
+                return {
+                    "is_duplicate": True,
+                    "duplicate_type": "DUPLICATE_TEXT_SIMILAR",
+                    "matched_event_id": similar.get("event_id"),
+                }
 
         return {
             "is_duplicate": False,
             "duplicate_type": None,
             "matched_event_id": None,
         }
+
+    def _find_similar(self, event_text: str, past_entries: list[dict]) -> dict | None:
+        """Return the past entry whose text is near-identical to event_text, if any."""
+        if rf_process is not None:
+            # Score every candidate in one C call instead of a Python loop
+            best = rf_process.extractOne(
+                event_text,
+                [entry["normalized_text"] for entry in past_entries],
+                scorer=rf_levenshtein.normalized_similarity,
+                score_cutoff=self.similarity_threshold,
+            )
+            return past_entries[best[2]] if best is not None else None
+
+        event_grams = text_qgrams(event_text)
+        for entry in past_entries:
+            entry_text = entry["normalized_text"]
+            entry_grams = entry.get("text_qgrams")
+            if entry_grams is None:
+                entry_grams = entry["text_qgrams"] = text_qgrams(entry_text)
+            # Cheap q-gram count filter before the O(len1*len2) DP
+            if not qgram_candidate(len(event_text), event_grams, len(entry_text),
+                                   entry_grams, self.similarity_threshold):
+                continue
+            ratio = levenshtein_ratio(event_text, entry_text)
+            if ratio >= self.similarity_threshold:
+                return entry
+        return None
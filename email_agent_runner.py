@@ -4,18 +4,20 @@ emails through the Notification Prioritization Engine.
 
 Usage:
     Live mode  :  python email_agent_runner.py
-    Test mode  :  python email_agent_runner.py --test
+    Test mode  :  python email_agent_runner.py --test [--parallel]
 """
 
 import sys
 import os
 import time
 import getpass
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
 # Ensure project root is on the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from config import IMAP_IDLE_TIMEOUT
 from decision_engine import DecisionEngine
 from email_listener import EmailListener
 
@@ -28,13 +30,18 @@ DECISION_ICONS = {
     "NEVER": "🔴",
 }
 
+# "<icon> <decision>" per decision, prebuilt so each email costs one lookup
+_DECISION_LABELS = {d: f"{icon} {d}" for d, icon in DECISION_ICONS.items()}
+
 
 def _print_decision(subject: str, decision: str, reason: str):
     """Print a formatted decision block for one email."""
-    icon = DECISION_ICONS.get(decision, "⚪")
-    print(f"\n  📧 EMAIL RECEIVED: {subject}")
-    print(f"     DECISION: {icon} {decision}")
-    print(f"     REASON:   {reason}")
+    label = _DECISION_LABELS.get(decision) or f"⚪ {decision}"
+    sys.stdout.write(
+        "\n  📧 EMAIL RECEIVED: " + subject
+        + "\n     DECISION: " + label
+        + "\n     REASON:   " + reason + "\n"
+    )
 
 
 # ── Core processing ──────────────────────────────────────────────────
@@ -58,26 +65,44 @@ def process_email(engine: DecisionEngine, email_data: dict) -> dict:
 
 # ── Test mode ─────────────────────────────────────────────────────────
 
-def simulate_email(subject: str, body: str = "") -> dict:
+def simulate_email(subject: str, body: str = "", ts: str | None = None) -> dict:
     """
     Build a fake parsed-email dict without connecting to any server.
-    Useful for testing the pipeline end-to-end.
+    Useful for testing the pipeline end-to-end. Pass a precomputed ISO
+    timestamp as ts when building many emails in a loop.
     """
     return {
         "sender": "test@example.com",
         "subject": subject,
         "body": body or subject,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": ts or datetime.now(timezone.utc).isoformat(),
     }
 
 
-def run_test():
-    """Run several simulated emails through the engine."""
+_worker_engine: DecisionEngine | None = None
+
+
+def _init_worker(rules_path: str):
+    """ProcessPoolExecutor initializer: build one engine per worker process."""
+    global _worker_engine
+    _worker_engine = DecisionEngine(rules_path=rules_path)
+
+
+def _worker_process_email(args: tuple[str, str, str]) -> dict:
+    """Classify one simulated (subject, body, ts) email inside a worker process."""
+    notification = EmailListener.email_to_notification(simulate_email(*args))
+    return _worker_engine.process_event(notification)
+
+
+def run_test(parallel: bool = False):
+    """
+    Run several simulated emails through the engine.
+    With parallel=True the emails are classified across worker processes,
+    each with its own engine (so history is not shared between workers).
+    """
     base_dir = os.path.dirname(os.path.abspath(__file__))
     rules_path = os.path.join(base_dir, "rules.json")
 
-    engine = DecisionEngine(rules_path=rules_path)
-
     test_subjects = [
         ("Meeting at 5 PM", "Don't forget your meeting with the design team at 5 PM today."),
         ("URGENT: Server is down!", "Production server web-03 is unresponsive. Immediate action required."),
@@ -89,15 +114,25 @@ def run_test():
         ("Team lunch tomorrow", "Hey, we're going to the new pizza place tomorrow at noon."),
     ]
 
+    ts = datetime.now(timezone.utc).isoformat()  # one timestamp for the whole batch
+    batch = [(s, b, ts) for s, b in test_subjects]
+
     print("\n" + "=" * 70)
     print("  📬  EMAIL AGENT — TEST MODE")
     print("=" * 70)
 
-    results = []
-    for subject, body in test_subjects:
-        fake_email = simulate_email(subject, body)
-        result = process_email(engine, fake_email)
-        results.append(result)
+    if parallel:
+        with ProcessPoolExecutor(initializer=_init_worker, initargs=(rules_path,)) as ex:
+            results = list(ex.map(_worker_process_email, batch))
+        for (subject, _, _), result in zip(batch, results):
+            _print_decision(subject, result["decision"], result["reason"])
+    else:
+        engine = DecisionEngine(rules_path=rules_path)
+        results = []
+        for subject, body, ts in batch:
+            fake_email = simulate_email(subject, body, ts)
+            result = process_email(engine, fake_email)
+            results.append(result)
 
     # Summary table
     print("\n" + "─" * 70)
@@ -114,8 +149,10 @@ def run_test():
 
 def run_live(email_address: str, password: str, poll_interval: int = 30):
     """
-    Continuously poll Gmail for unread emails, classify each one,
+    Continuously watch Gmail for unread emails, classify each one,
     and log the decision.  Runs until interrupted with Ctrl+C.
+    Uses IMAP IDLE so new mail is picked up as soon as the server pushes
+    it; falls back to polling every poll_interval seconds otherwise.
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
     rules_path = os.path.join(base_dir, "rules.json")
@@ -125,10 +162,14 @@ def run_live(email_address: str, password: str, poll_interval: int = 30):
 
     print("\n" + "=" * 70)
     print("  📬  EMAIL AGENT — LIVE MODE")
-    print(f"  Polling every {poll_interval}s  •  Press Ctrl+C to stop")
+    print("  Waiting for new mail  •  Press Ctrl+C to stop")
     print("=" * 70)
 
     listener.connect()
+    if listener.supports_idle:
+        print("  ⚡ Server supports IDLE — new mail is pushed, not polled.")
+    else:
+        print(f"  Polling every {poll_interval}s")
 
     try:
         cycle = 0
@@ -157,7 +198,18 @@ def run_live(email_address: str, password: str, poll_interval: int = 30):
                 for eml in emails:
                     process_email(engine, eml)
 
-            time.sleep(poll_interval)
+            if listener.supports_idle:
+                try:
+                    listener.idle(IMAP_IDLE_TIMEOUT)
+                except Exception as e:
+                    print(f"  ⚠️  IDLE error: {e}")
+                    try:
+                        listener.disconnect()
+                        listener.connect()
+                    except Exception:
+                        time.sleep(poll_interval)
+            else:
+                time.sleep(poll_interval)
 
     except KeyboardInterrupt:
         print("\n\n🛑 Agent stopped by user.")
@@ -170,7 +222,7 @@ def run_live(email_address: str, password: str, poll_interval: int = 30):
 
 def main():
     if "--test" in sys.argv:
-        run_test()
+        run_test(parallel="--parallel" in sys.argv)
         return
 
     # Live mode — prompt for credentials
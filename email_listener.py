@@ -10,11 +10,26 @@ apply keyword-based priority mapping, and extract meeting details
 import imaplib
 import email
 import email.header
+import email.message
+import email.parser
 import email.utils
 import re
-import html
-import uuid
-from datetime import datetime, timezone
+import select
+import ssl
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from config import (
+    FETCH_BATCH_SIZE, FETCH_BODY_BYTES, MAX_EMAIL_BYTES, MAX_HEADER_SEMICOLONS,
+    MEETING_SCAN_CHARS,
+)
+
+try:
+    import hyperscan
+except ImportError:  # optional: falls back to the combined re alternation
+    hyperscan = None
 
 
 # Explicit Keyword Lists for Classification Hints
@@ -37,10 +52,69 @@ VERY_IMPORTANT_REGEX = re.compile(r'(' + '|'.join(VERY_IMPORTANT_KEYWORDS) + r')
 IMPORTANT_REGEX = re.compile(r'(' + '|'.join(IMPORTANT_KEYWORDS) + r')', re.IGNORECASE)
 IGNORE_REGEX = re.compile(r'(' + '|'.join(IGNORE_KEYWORDS) + r')', re.IGNORECASE)
 
+# All three buckets in one alternation; match.lastgroup names the bucket hit
+_PRIORITY_RE = re.compile(
+    r'(?P<urgent>' + '|'.join(VERY_IMPORTANT_KEYWORDS) + r')'
+    r'|(?P<ignore>' + '|'.join(IGNORE_KEYWORDS) + r')'
+    r'|(?P<important>' + '|'.join(IMPORTANT_KEYWORDS) + r')',
+    re.IGNORECASE
+)
+
+
+_BUCKETS = ("urgent", "ignore", "important")
+
+
+def _compile_keyword_db():
+    """Compile every priority keyword into one Hyperscan database, id = bucket."""
+    expressions, ids = [], []
+    for bucket_id, keywords in enumerate(
+            (VERY_IMPORTANT_KEYWORDS, IGNORE_KEYWORDS, IMPORTANT_KEYWORDS)):
+        for kw in keywords:
+            expressions.append(kw.encode())
+            ids.append(bucket_id)
+    db = hyperscan.Database()
+    db.compile(
+        expressions=expressions,
+        ids=ids,
+        elements=len(expressions),
+        flags=hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH,
+    )
+    return db
+
+
+_KEYWORD_DB = _compile_keyword_db() if hyperscan is not None else None
+_scratch = threading.local()  # Hyperscan scratch space is per-thread
+
+
+def _on_keyword(bucket_id, start, end, flags, found):
+    found.add(_BUCKETS[bucket_id])
+    return len(found) == 3  # truthy return stops the scan
+
+
+def _keyword_buckets(text: str) -> set[str]:
+    """Return which of urgent / ignore / important keyword buckets occur in text."""
+    found = set()
+    # Hyperscan's \b is ASCII-only, so non-ASCII text keeps re's Unicode \b
+    if _KEYWORD_DB is not None and text.isascii():
+        scratch = getattr(_scratch, "value", None)
+        if scratch is None:
+            scratch = _scratch.value = hyperscan.Scratch(_KEYWORD_DB)
+        try:
+            _KEYWORD_DB.scan(text.encode("ascii"), match_event_handler=_on_keyword,
+                             context=found, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            pass  # all three buckets seen; _on_keyword stopped the scan early
+        return found
+    for m in _PRIORITY_RE.finditer(text):
+        found.add(m.lastgroup)
+        if len(found) == 3:
+            break
+    return found
+
 # ── Meeting detail extraction patterns ────────────────────────────
 # Time: matches "at 3pm", "at 15:30", "3:00 PM", "3pm", "3 PM", "at 3 PM IST"
 _TIME_PATTERN = re.compile(
-    r'(?:at\s+)?(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm)?(?:\s*[A-Z]{2,4})?)'
+    r'\b(?:at\s+)?(\d{1,2}(?::\d{2})?\s*(?:AM|PM|am|pm)?(?:\s*[A-Z]{2,4})?)'
     r'(?=\s|,|\.|$)',
     re.IGNORECASE
 )
@@ -54,9 +128,12 @@ _DATE_PATTERN = re.compile(
     re.IGNORECASE
 )
 # Location: matches "at Office", "in Room 4B", "via Zoom", "on Google Meet", "Link:"
+# The keyword is fenced by \b and a separator so it never fires inside a word
+# ("meeting", "flat"), and the separator / capture classes are disjoint so
+# there is nothing to backtrack over
 _LOCATION_PATTERN = re.compile(
-    r'(?:(?:at|in|via|on|location[:\s]+|venue[:\s]+|place[:\s]+|room[:\s]+|link[:\s]+)\s*)'
-    r'([\w][\w\s\-\.@/#:]{2,60})',
+    r'\b(?:at|in|via|on|location|venue|place|room|link)[:\s]+'
+    r'(\w[\w\s\-\.@/#:]{2,60})',
     re.IGNORECASE
 )
 # Topic / Agenda: matches "agenda:", "about:", "topic:", "re:", "regarding"
@@ -64,6 +141,98 @@ _AGENDA_PATTERN = re.compile(
     r'(?:agenda|topic|about|re|regarding|subject|purpose)[:\s]+([^\n\.]{5,120})',
     re.IGNORECASE
 )
+# Online meeting links: Zoom / Meet / Teams / Webex URLs
+_ZOOM_PATTERN = re.compile(
+    r'(zoom\.us/[^\s]+|meet\.google\.com/[^\s]+|teams\.microsoft\.com/[^\s]+'
+    r'|https?://[^\s]+(?:zoom|meet|webex|teams)[^\s]*)',
+    re.IGNORECASE
+)
+# A bare time ("3 PM", "15:30 am") that bled into a location match
+_TIMELIKE_PATTERN = re.compile(r'\d{1,2}(?::\d{2})?\s*(?:AM|PM)', re.IGNORECASE)
+# A time candidate needs AM/PM or a colon to count as a time
+_AMPM_OR_COLON_PATTERN = re.compile(r'[APap][Mm]|:')
+
+# Header block parsing for single-part messages (see _parse_message)
+_HEADER_PARSER = email.parser.BytesHeaderParser()
+_HEADER_END_PATTERN = re.compile(rb'\n\r?\n')
+# Runs like ';;;;' or '; ; ;' that make header parameter parsing crawl
+_SEMICOLON_RUN_PATTERN = re.compile(rb';(?:[ \t]*;)+')
+
+# HTML stripping: line breaks become newlines, every other tag is dropped
+_BR_PATTERN = re.compile(r'<br\s*/?>', re.IGNORECASE)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Date header in the one layout mail servers almost always emit, e.g.
+# "Wed, 17 Apr 2024 14:23:05 +0000"; anything else goes through email.utils
+_FAST_DATE_RE = re.compile(
+    r'(?:[A-Z][a-z]{2}, )?(\d{1,2}) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) '
+    r'([1-9]\d{3}) (\d{2}):(\d{2}):(\d{2}) ([+-]\d{4})'
+)
+_MONTHS = {name: i for i, name in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+     "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+
+
+@lru_cache(maxsize=64)
+def _zone(offset: str) -> timezone:
+    """Timezone for a '+hhmm' / '-hhmm' offset (few distinct values occur)."""
+    seconds = int(offset[1:3]) * 3600 + int(offset[3:]) * 60
+    return timezone(timedelta(seconds=-seconds if offset[0] == "-" else seconds))
+
+
+def _parse_date(date_str: str) -> datetime:
+    """Parse a Date header, trying the common RFC 2822 layout first."""
+    m = _FAST_DATE_RE.fullmatch(date_str) if isinstance(date_str, str) else None
+    if m is not None:
+        day, mon, year, hh, mm, ss, zone = m.groups()
+        try:
+            return datetime(int(year), _MONTHS[mon], int(day), int(hh), int(mm), int(ss),
+                            # -0000 means "UTC, local zone unknown": naive, as in email.utils
+                            tzinfo=None if zone == "-0000" else _zone(zone))
+        except ValueError:
+            pass  # out-of-range field: let email.utils decide
+    return email.utils.parsedate_to_datetime(date_str)
+
+
+# Partial FETCH: only the headers _parse_email reads plus the head of the body.
+# The PEEK form leaves \Seen alone so the explicit STORE stays authoritative.
+_FETCH_HEADERS = "SUBJECT FROM DATE MESSAGE-ID CONTENT-TYPE CONTENT-TRANSFER-ENCODING"
+_FETCH_PEEK = (f"(BODY.PEEK[HEADER.FIELDS ({_FETCH_HEADERS})] "
+               f"BODY.PEEK[TEXT]<0.{FETCH_BODY_BYTES}>)")
+_FETCH_SEEN = (f"(BODY[HEADER.FIELDS ({_FETCH_HEADERS})] "
+               f"BODY[TEXT]<0.{FETCH_BODY_BYTES}>)")
+
+
+# Untagged responses announcing a mailbox change (new mail) during IDLE
+_MAILBOX_UPDATES = (b"EXISTS\r\n", b"RECENT\r\n")
+
+
+def _take_mailbox_updates(conn: imaplib.IMAP4) -> bool:
+    """Pop EXISTS/RECENT announcements imaplib filed away; True if there were any."""
+    found = False
+    for name in ("EXISTS", "RECENT"):
+        found = conn.untagged_responses.pop(name, None) is not None or found
+    return found
+
+
+def _has_buffered_input(conn: imaplib.IMAP4) -> bool:
+    """
+    True if a line can be read without waiting: bytes already sitting in
+    imaplib's buffered reader or decrypted by TLS, neither of which select()
+    can see. Peeks with the socket briefly non-blocking so it never stalls.
+    """
+    sock = conn.socket()
+    pending = getattr(sock, "pending", None)
+    if pending and pending():
+        return True
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+        return False
+    finally:
+        sock.settimeout(timeout)
 
 
 class EmailListener:
@@ -98,6 +267,78 @@ class EmailListener:
             self._connection = None
             print("[EmailListener] Disconnected.")
 
+    @property
+    def supports_idle(self) -> bool:
+        """True if the connected server advertises the IMAP IDLE extension."""
+        return bool(self._connection) and "IDLE" in self._connection.capabilities
+
+    def idle(self, timeout: float) -> bool:
+        """
+        Block in IMAP IDLE (RFC 2177) on the selected INBOX until the server
+        pushes a mailbox change or timeout seconds elapse. Returns True if new
+        mail was signalled (including since the last fetch), False on timeout.
+        """
+        if not self._connection:
+            raise RuntimeError("Not connected — call connect() first")
+
+        conn = self._connection
+        if conn.state != "SELECTED":
+            self._select_inbox()
+        # Mail that landed after the last SELECT was announced in an earlier
+        # reply (imaplib keeps it in untagged_responses); the server will not
+        # announce it again during IDLE, so report it right away
+        if _take_mailbox_updates(conn):
+            return True
+
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+        pushed = False
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed entering IDLE")
+            if line.startswith(b"+"):
+                break
+            if not line.startswith(b"*"):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+            # Untagged data may precede the continuation; keep any new-mail news
+            pushed = pushed or line.endswith(_MAILBOX_UPDATES)
+
+        sock = conn.socket()
+        deadline = time.monotonic() + timeout
+        while not pushed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not _has_buffered_input(conn):
+                ready, _, _ = select.select([sock], [], [], remaining)
+                if not ready:
+                    break
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            pushed = line.endswith(_MAILBOX_UPDATES)
+
+        # Leave IDLE and drain untagged responses up to the tagged completion
+        conn.send(b"DONE\r\n")
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while leaving IDLE")
+            if line.startswith(tag):
+                return pushed
+            if line.endswith(_MAILBOX_UPDATES):
+                pushed = True
+
+    def _select_inbox(self):
+        """
+        SELECT INBOX. The EXISTS/RECENT counts in its reply describe mail the
+        caller is about to search, so they are discarded; any that arrive
+        later signal new mail to idle().
+        """
+        self._connection.select("INBOX")
+        _take_mailbox_updates(self._connection)
+
     def fetch_unread(self) -> list[dict]:
         """
         Search INBOX for UNSEEN messages, parse each one, and return
@@ -106,27 +347,23 @@ class EmailListener:
         if not self._connection:
             raise RuntimeError("Not connected — call connect() first")
 
-        self._connection.select("INBOX")
-        status, data = self._connection.search(None, "UNSEEN")
+        self._select_inbox()
+        status, data = self._connection.uid("SEARCH", None, "UNSEEN")
 
         if status != "OK" or not data[0]:
             return []
 
-        message_ids = data[0].split()
+        uids = data[0].split()
         emails = []
 
-        for mid in message_ids:
-            status, msg_data = self._connection.fetch(mid, "(RFC822)")
-            if status != "OK":
+        for batch in self._batches(uids):
+            fetched = self._fetch_batch(batch, _FETCH_PEEK)
+            if fetched is None:
                 continue
-
-            raw_bytes = msg_data[0][1]
-            parsed = self._parse_email(raw_bytes)
-            if parsed:
-                emails.append(parsed)
+            emails.extend(fetched)
 
             # Mark as SEEN so we don't re-process
-            self._connection.store(mid, "+FLAGS", "\\Seen")
+            self._connection.uid("STORE", b",".join(batch), "+FLAGS", "\\Seen")
 
         return emails
 
@@ -138,33 +375,63 @@ class EmailListener:
         if not self._connection:
             raise RuntimeError("Not connected — call connect() first")
 
-        self._connection.select("INBOX")
+        self._select_inbox()
 
         # Calculate date N hours ago in IMAP format (DD-Mon-YYYY)
         from datetime import datetime, timedelta
         since_date = (datetime.now() - timedelta(hours=hours)).strftime("%d-%b-%Y")
 
         # Search for emails since that date
-        status, data = self._connection.search(None, f"(SINCE {since_date})")
+        status, data = self._connection.uid("SEARCH", None, f"(SINCE {since_date})")
 
         if status != "OK" or not data[0]:
             return []
 
-        message_ids = data[0].split()
+        uids = data[0].split()
         # Get most recent ones first, limited to 'limit'
-        message_ids = message_ids[-limit:]
+        uids = uids[-limit:]
 
         emails = []
-        for mid in message_ids:
-            status, msg_data = self._connection.fetch(mid, "(RFC822)")
-            if status != "OK":
-                continue
+        for batch in self._batches(uids):
+            emails.extend(self._fetch_batch(batch, _FETCH_SEEN) or [])
 
-            raw_bytes = msg_data[0][1]
+        return emails
+
+    @staticmethod
+    def _batches(message_ids: list[bytes]):
+        """Yield message ids in chunks of FETCH_BATCH_SIZE."""
+        for i in range(0, len(message_ids), FETCH_BATCH_SIZE):
+            yield message_ids[i:i + FETCH_BATCH_SIZE]
+
+    def _fetch_batch(self, batch: list[bytes], query: str) -> list[dict] | None:
+        """
+        UID FETCH a batch of messages in one ranged command and parse each.
+        query selects a header block and a body prefix (_FETCH_PEEK /
+        _FETCH_SEEN), which are re-joined into one RFC-822 message.
+        Returns None if the server rejected the FETCH.
+        """
+        status, msg_data = self._connection.uid("FETCH", b",".join(batch), query)
+        if status != "OK":
+            return None
+
+        emails = []
+        header = body = None
+        # imaplib yields one (envelope, literal) tuple per fetched section,
+        # then the rest of the response line (b")") closing each message
+        for item in msg_data:
+            if isinstance(item, tuple):
+                if b"HEADER" in item[0]:
+                    header = item[1]
+                else:
+                    body = item[1]
+                continue
+            if header is None:
+                continue
+            raw_bytes = header.rstrip(b"\r\n") + b"\r\n\r\n" + (body or b"")
+            header = body = None
             parsed = self._parse_email(raw_bytes)
             if parsed:
                 emails.append(parsed)
-
         return emails
 
     @staticmethod
@@ -184,14 +451,41 @@ class EmailListener:
     @staticmethod
     def _strip_html(text: str) -> str:
         """Remove HTML tags and decode entities."""
-        text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
-        text = re.sub(r'<[^>]+>', '', text)
+        import html  # deferred: only HTML-only bodies need the entity table
+        if "<" in text:
+            text = _BR_PATTERN.sub("\n", text)
+            text = _TAG_PATTERN.sub("", text)
         return html.unescape(text).strip()
 
+    @staticmethod
+    def _parse_message(raw_bytes: bytes) -> email.message.Message:
+        """
+        Parse raw bytes into a Message, building the full MIME tree only when
+        there are parts to walk. Single-part messages get just their header
+        block parsed, with the rest attached as the (undecoded) payload.
+        """
+        # Bound the work a hostile message can cause before any parsing
+        if len(raw_bytes) > MAX_EMAIL_BYTES:
+            raw_bytes = raw_bytes[:MAX_EMAIL_BYTES]
+        sep = _HEADER_END_PATTERN.search(raw_bytes)
+        header_end = sep.end() if sep is not None else len(raw_bytes)
+        if raw_bytes.count(b";", 0, header_end) > MAX_HEADER_SEMICOLONS:
+            raw_bytes = (_SEMICOLON_RUN_PATTERN.sub(b";", raw_bytes[:header_end])
+                         + raw_bytes[header_end:])
+            sep = _HEADER_END_PATTERN.search(raw_bytes)
+
+        if sep is not None:
+            msg = _HEADER_PARSER.parsebytes(raw_bytes[:sep.end()])
+            # A leftover payload means the block held a non-header line
+            if not msg.get_payload() and msg.get_content_maintype() not in ("multipart", "message"):
+                msg.set_payload(raw_bytes[sep.end():].decode("ascii", "surrogateescape"))
+                return msg
+        return email.message_from_bytes(raw_bytes)
+
     def _parse_email(self, raw_bytes: bytes) -> dict | None:
         """Parse raw RFC-822 bytes into a structured dict."""
         try:
-            msg = email.message_from_bytes(raw_bytes)
+            msg = self._parse_message(raw_bytes)
         except Exception:
             return None
 
@@ -200,12 +494,13 @@ class EmailListener:
         message_id = msg.get("Message-ID", "").strip("<>")
 
         if not message_id:
-            message_id = f"generated-{uuid.uuid4()}"
+            import uuid  # deferred: most messages carry a Message-ID
+            message_id = f"generated-{uuid.uuid4().hex}"
 
         # Parse date
         date_str = msg.get("Date", "")
         try:
-            parsed_dt = email.utils.parsedate_to_datetime(date_str)
+            parsed_dt = _parse_date(date_str)
             if parsed_dt.tzinfo is None:
                 parsed_dt = parsed_dt.replace(tzinfo=timezone.utc)
             timestamp = parsed_dt.isoformat()
@@ -215,6 +510,7 @@ class EmailListener:
         # Extract body
         body = ""
         if msg.is_multipart():
+            html_parts = []
             for part in msg.walk():
                 content_type = part.get_content_type()
                 if content_type == "text/plain":
@@ -225,7 +521,11 @@ class EmailListener:
                             errors="replace",
                         )
                     break
-                elif content_type == "text/html" and not body:
+                elif content_type == "text/html":
+                    html_parts.append(part)
+            # Strip HTML only when there is no text/plain alternative to use
+            if not body:
+                for part in html_parts:
                     payload = part.get_payload(decode=True)
                     if payload:
                         body = self._strip_html(
@@ -234,6 +534,8 @@ class EmailListener:
                                 errors="replace",
                             )
                         )
+                        if body:
+                            break
         else:
             payload = msg.get_payload(decode=True)
             if payload:
@@ -259,7 +561,8 @@ class EmailListener:
         Returns a dict with keys: time, date, location, topic.
         Any field that could not be found is None.
         """
-        full_text = f"{subject}\n{body}"
+        # Details sit near the top; capping the scan bounds regex time on huge bodies
+        full_text = f"{subject}\n{body[:MEETING_SCAN_CHARS]}"
         details = {"time": None, "date": None, "location": None, "topic": None}
 
         # Time
@@ -267,7 +570,7 @@ class EmailListener:
         if time_match:
             candidate = time_match.group(1).strip()
             # Filter out pure numbers with no AM/PM (likely not a time)
-            if re.search(r'[APap][Mm]|:', candidate):
+            if _AMPM_OR_COLON_PATTERN.search(candidate):
                 details["time"] = candidate
 
         # Date
@@ -277,11 +580,7 @@ class EmailListener:
 
         # Location — try known patterns
         # First, look for Zoom/Meet/Teams links or explicit location words
-        zoom_match = re.search(
-            r'(zoom\.us/[^\s]+|meet\.google\.com/[^\s]+|teams\.microsoft\.com/[^\s]+'
-            r'|https?://[^\s]+(?:zoom|meet|webex|teams)[^\s]*)',
-            full_text, re.IGNORECASE
-        )
+        zoom_match = _ZOOM_PATTERN.search(full_text)
         if zoom_match:
             details["location"] = zoom_match.group(0)[:80]
         else:
@@ -289,7 +588,7 @@ class EmailListener:
             if loc_match:
                 candidate = loc_match.group(1).strip()
                 # Drop time-like matches that bled into location
-                if not re.fullmatch(r'\d{1,2}(?::\d{2})?\s*(?:AM|PM)', candidate, re.IGNORECASE):
+                if not _TIMELIKE_PATTERN.fullmatch(candidate):
                     details["location"] = candidate[:80]
 
         # Topic / Agenda
@@ -316,18 +615,19 @@ class EmailListener:
 
         full_text = f"{subject} {body}"
 
-        # Determine priority hint based on explicit keyword rules
+        # Determine priority hint based on explicit keyword rules (one scan)
+        buckets = _keyword_buckets(full_text)
         priority = "medium"  # default to IMPORTANT/LATER
-        if VERY_IMPORTANT_REGEX.search(full_text):
+        if "urgent" in buckets:
             priority = "urgent"  # maps to NOW
-        elif IGNORE_REGEX.search(full_text):
+        elif "ignore" in buckets:
             priority = "low"     # maps to NEVER
-        elif IMPORTANT_REGEX.search(full_text):
+        elif "important" in buckets:
             priority = "high"    # maps to LATER/NOW (LLM will push to LATER per assignment)
 
         # Extract meeting details if this looks like a meeting email
         meeting_details = {}
-        is_meeting = bool(IMPORTANT_REGEX.search(full_text))
+        is_meeting = "important" in buckets
         if is_meeting:
             meeting_details = EmailListener.extract_meeting_details(subject, body)
 
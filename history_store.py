@@ -2,9 +2,34 @@
 History Store — in-memory per-user ring buffer of recent notification decisions.
 """
 
+import sys
+import threading
+from bisect import bisect_left, insort
 from collections import defaultdict, deque
 from datetime import datetime, timedelta, timezone
-from config import HISTORY_BUFFER_SIZE
+from operator import itemgetter
+from config import HISTORY_BUFFER_SIZE, HISTORY_SHARD_COUNT
+
+_MIN_TS = datetime.min.replace(tzinfo=timezone.utc)
+_BY_SEQ = itemgetter(1)
+# Low-cardinality record fields shared across many records; interned on add
+_INTERNED_FIELDS = ("event_type", "source", "decision", "explanation_code")
+
+
+def _cutoff(window_minutes: int, now: datetime | None) -> datetime:
+    """Start of a window ending at now (the current UTC time if not given)."""
+    return (now or datetime.now(timezone.utc)) - timedelta(minutes=window_minutes)
+
+
+def _urgent_keys(record: dict) -> tuple[tuple, tuple]:
+    """Keys a NOW record is indexed under for the noise check: its event_type and source."""
+    return ("event_type", record.get("event_type")), ("source", record.get("source"))
+
+
+def _count_keys(record: dict) -> tuple[tuple, tuple]:
+    """Index keys a record is counted under: its event_type, and event_type+decision."""
+    event_type = record.get("event_type")
+    return (event_type,), (event_type, record.get("decision"))
 
 
 class HistoryStore:
@@ -13,77 +38,251 @@ class HistoryStore:
     def __init__(self, buffer_size: int = HISTORY_BUFFER_SIZE):
         self.buffer_size = buffer_size
         self._store: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.buffer_size))
+        # Per-user insertion counter; record N is evicted once N <= count - buffer_size
+        self._seq: dict[str, int] = defaultdict(int)
+        # user_id → [(parsed_timestamp, seq, record)] sorted by time, mirroring
+        # the ring buffer so windowed queries bisect to the cutoff
+        self._timeline: dict[str, list[tuple]] = defaultdict(list)
+        # user_id → {(event_type,) | (event_type, decision): [(parsed_timestamp, seq)]}
+        # sorted by time, so per-type counts are two bisects instead of a scan
+        self._counts: dict[str, dict[tuple, list]] = defaultdict(lambda: defaultdict(list))
+        # user_id → {("event_type"|"source", value): deque[(seq, parsed_timestamp)]}
+        # holding only the NOW decisions still in the ring buffer, so noise
+        # checks skip the full buffer scan
+        self._urgent: dict[str, dict[tuple, deque]] = defaultdict(lambda: defaultdict(deque))
 
     def add(self, user_id: str, record: dict):
         """Add a decision record for a user."""
-        self._store[user_id].append(record)
+        for field in _INTERNED_FIELDS:
+            value = record.get(field)
+            if type(value) is str:  # sys.intern rejects str subclasses
+                record[field] = sys.intern(value)
+        store = self._store[user_id]
+        timeline = self._timeline[user_id]
+        counts = self._counts[user_id]
+        if len(store) == self.buffer_size:
+            # The ring buffer is about to drop its oldest record; drop it from
+            # every index too, and forget index keys left with no entries
+            evicted = store[0]
+            evicted_seq = self._seq[user_id] - self.buffer_size + 1
+            key = (evicted.get("parsed_timestamp", _MIN_TS), evicted_seq)
+            del timeline[bisect_left(timeline, key)]
+            for index_key in _count_keys(evicted):
+                entries = counts[index_key]
+                del entries[bisect_left(entries, key)]
+                if not entries:
+                    del counts[index_key]
+            if evicted.get("decision") == "NOW":
+                urgent = self._urgent[user_id]
+                for urgent_key in _urgent_keys(evicted):
+                    entries = urgent[urgent_key]
+                    # Entries are in seq order, so the evicted one is first
+                    entries.popleft()
+                    if not entries:
+                        del urgent[urgent_key]
+        store.append(record)
+        self._seq[user_id] += 1
+        seq = self._seq[user_id]
+        ts = record.get("parsed_timestamp", _MIN_TS)
+        insort(timeline, (ts, seq, record))
+        for index_key in _count_keys(record):
+            insort(counts[index_key], (ts, seq))
+        if record.get("decision") == "NOW":
+            urgent = self._urgent[user_id]
+            for urgent_key in _urgent_keys(record):
+                urgent[urgent_key].append((seq, ts))
 
-    def get_recent(self, user_id: str, window_minutes: int = None) -> list[dict]:
+    def _window(self, user_id: str, window_minutes: int,
+                now: datetime | None = None) -> list[tuple]:
+        """Timeline entries (ts, seq, record) no older than window_minutes, by time."""
+        timeline = self._timeline.get(user_id)
+        if not timeline:
+            return []
+        cutoff = _cutoff(window_minutes, now)
+        return timeline[bisect_left(timeline, (cutoff,)):]
+
+    def get_recent(self, user_id: str, window_minutes: int = None,
+                   now: datetime | None = None) -> list[dict]:
         """Get recent decision records for a user, optionally within a time window."""
-        records = list(self._store.get(user_id, []))
-        if window_minutes is not None:
-            cutoff = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
-            records = [
-                r for r in records
-                if r.get("parsed_timestamp", datetime.min.replace(tzinfo=timezone.utc)) >= cutoff
-            ]
-        return records
-
-    def count_in_window(self, user_id: str, window_minutes: int) -> int:
+        if window_minutes is None:
+            return list(self._store.get(user_id, []))
+        window = self._window(user_id, window_minutes, now)
+        # Callers expect insertion order; the timeline is ordered by time
+        window.sort(key=_BY_SEQ)
+        return [r for _, _, r in window]
+
+    def count_in_window(self, user_id: str, window_minutes: int,
+                        now: datetime | None = None) -> int:
         """Count how many decisions exist for a user in the last N minutes."""
-        return len(self.get_recent(user_id, window_minutes))
+        timeline = self._timeline.get(user_id)
+        if not timeline:
+            return 0
+        cutoff = _cutoff(window_minutes, now)
+        return len(timeline) - bisect_left(timeline, (cutoff,))
+
+    def _count_since(self, user_id: str, index_key: tuple, window_minutes: int,
+                     now: datetime | None = None) -> int:
+        """Count indexed entries under index_key no older than window_minutes."""
+        entries = self._counts.get(user_id, {}).get(index_key)
+        if not entries:
+            return 0
+        cutoff = _cutoff(window_minutes, now)
+        return len(entries) - bisect_left(entries, (cutoff,))
 
     def count_decisions_by_type(
-        self, user_id: str, event_type: str, decision: str, window_minutes: int
+        self, user_id: str, event_type: str, decision: str, window_minutes: int,
+        now: datetime | None = None,
     ) -> int:
         """Count decisions of a specific type+decision combo in a window."""
-        recent = self.get_recent(user_id, window_minutes)
-        return sum(
-            1 for r in recent
-            if r.get("event_type") == event_type and r.get("decision") == decision
-        )
+        return self._count_since(user_id, (event_type, decision), window_minutes, now)
 
-    def count_by_event_type(self, user_id: str, event_type: str, window_minutes: int) -> int:
+    def count_by_event_type(self, user_id: str, event_type: str, window_minutes: int,
+                            now: datetime | None = None) -> int:
         """Count events of a specific type within a window."""
-        recent = self.get_recent(user_id, window_minutes)
-        return sum(1 for r in recent if r.get("event_type") == event_type)
+        return self._count_since(user_id, (event_type,), window_minutes, now)
 
     def count_urgent_by_source_or_type(
-        self, user_id: str, event_type: str, source: str, window_minutes: int
+        self, user_id: str, event_type: str, source: str, window_minutes: int,
+        now: datetime | None = None,
     ) -> int:
         """Count NOW decisions from the same event_type or source in a window."""
-        recent = self.get_recent(user_id, window_minutes)
-        return sum(
-            1 for r in recent
-            if r.get("decision") == "NOW"
-            and (r.get("event_type") == event_type or r.get("source") == source)
-        )
-
-    def get_dedupe_key_entries(self, user_id: str, dedupe_key: str, window_minutes: int) -> list[dict]:
+        urgent = self._urgent.get(user_id)
+        if not urgent:
+            return 0
+        cutoff = _cutoff(window_minutes, now)
+        matched = set()
+        for key in (("event_type", event_type), ("source", source)):
+            entries = urgent.get(key)
+            if entries:
+                matched.update(seq for seq, ts in entries if ts >= cutoff)
+        return len(matched)
+
+    def get_dedupe_key_entries(self, user_id: str, dedupe_key: str, window_minutes: int,
+                               now: datetime | None = None) -> list[dict]:
         """Find entries with a matching dedupe_key within a window."""
-        recent = self.get_recent(user_id, window_minutes)
+        recent = self.get_recent(user_id, window_minutes, now)
         return [r for r in recent if r.get("dedupe_key") == dedupe_key]
 
-    def get_text_entries(self, user_id: str, window_minutes: int) -> list[dict]:
+    def get_text_entries(self, user_id: str, window_minutes: int,
+                         now: datetime | None = None) -> list[dict]:
         """Get entries with their text content for near-duplicate checking."""
-        recent = self.get_recent(user_id, window_minutes)
+        recent = self.get_recent(user_id, window_minutes, now)
         return [r for r in recent if r.get("normalized_text")]
 
-    def count_event_type_today(self, user_id: str, event_type: str) -> int:
+    def count_event_type_today(self, user_id: str, event_type: str,
+                               now: datetime | None = None) -> int:
         """Count events of a specific type today (UTC)."""
-        today = datetime.now(timezone.utc).date()
-        records = list(self._store.get(user_id, []))
-        return sum(
-            1 for r in records
-            if r.get("event_type") == event_type
-            and r.get("parsed_timestamp", datetime.min.replace(tzinfo=timezone.utc)).date() == today
-        )
+        entries = self._counts.get(user_id, {}).get((event_type,))
+        if not entries:
+            return 0
+        today = (now or datetime.now(timezone.utc)).date()
+        # .date() is taken in each timestamp's own offset, so this stays a scan
+        return sum(1 for ts, _ in entries if ts.date() == today)
 
     def clear(self):
         """Clear all history."""
         self._store.clear()
+        self._seq.clear()
+        self._timeline.clear()
+        self._counts.clear()
+        self._urgent.clear()
 
     def clear_user(self, user_id: str):
         """Clear history for a specific user."""
         if user_id in self._store:
             del self._store[user_id]
+        self._seq.pop(user_id, None)
+        self._timeline.pop(user_id, None)
+        self._counts.pop(user_id, None)
+        self._urgent.pop(user_id, None)
+
+
+class ShardedHistoryStore:
+    """
+    HistoryStore striped across lock-protected shards by user_id, so
+    concurrent writers only contend when their users share a shard.
+    """
+
+    def __init__(self, shard_count: int = HISTORY_SHARD_COUNT,
+                 buffer_size: int = HISTORY_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._shards = [HistoryStore(buffer_size) for _ in range(shard_count)]
+        self._locks = [threading.Lock() for _ in range(shard_count)]
+
+    def _shard(self, user_id: str) -> tuple[HistoryStore, threading.Lock]:
+        """Return the (store, lock) pair that owns a user."""
+        index = hash(user_id) % len(self._shards)
+        return self._shards[index], self._locks[index]
+
+    def add(self, user_id: str, record: dict):
+        store, lock = self._shard(user_id)
+        with lock:
+            store.add(user_id, record)
+
+    def get_recent(self, user_id: str, window_minutes: int = None,
+                   now: datetime | None = None) -> list[dict]:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.get_recent(user_id, window_minutes, now)
+
+    def count_in_window(self, user_id: str, window_minutes: int,
+                        now: datetime | None = None) -> int:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.count_in_window(user_id, window_minutes, now)
+
+    def count_decisions_by_type(
+        self, user_id: str, event_type: str, decision: str, window_minutes: int,
+        now: datetime | None = None,
+    ) -> int:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.count_decisions_by_type(
+                user_id, event_type, decision, window_minutes, now
+            )
+
+    def count_by_event_type(self, user_id: str, event_type: str, window_minutes: int,
+                            now: datetime | None = None) -> int:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.count_by_event_type(user_id, event_type, window_minutes, now)
+
+    def count_urgent_by_source_or_type(
+        self, user_id: str, event_type: str, source: str, window_minutes: int,
+        now: datetime | None = None,
+    ) -> int:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.count_urgent_by_source_or_type(
+                user_id, event_type, source, window_minutes, now
+            )
+
+    def get_dedupe_key_entries(self, user_id: str, dedupe_key: str, window_minutes: int,
+                               now: datetime | None = None) -> list[dict]:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.get_dedupe_key_entries(user_id, dedupe_key, window_minutes, now)
+
+    def get_text_entries(self, user_id: str, window_minutes: int,
+                         now: datetime | None = None) -> list[dict]:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.get_text_entries(user_id, window_minutes, now)
+
+    def count_event_type_today(self, user_id: str, event_type: str,
+                               now: datetime | None = None) -> int:
+        store, lock = self._shard(user_id)
+        with lock:
+            return store.count_event_type_today(user_id, event_type, now)
+
+    def clear(self):
+        """Clear all history."""
+        for store, lock in zip(self._shards, self._locks):
+            with lock:
+                store.clear()
+
+    def clear_user(self, user_id: str):
+        """Clear history for a specific user."""
+        store, lock = self._shard(user_id)
+        with lock:
+            store.clear_user(user_id)
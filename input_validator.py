@@ -6,10 +6,10 @@ import uuid
 from datetime import datetime, timezone
 
 
-REQUIRED_FIELDS = ["user_id", "event_type", "message", "timestamp", "channel"]
-VALID_EVENT_TYPES = {"message", "reminder", "alert", "promotion", "system", "update", "email"}
-VALID_CHANNELS = {"push", "email", "sms", "in_app"}
-VALID_PRIORITY_HINTS = {"low", "medium", "high", "urgent"}
+REQUIRED_FIELDS = ("user_id", "event_type", "message", "timestamp", "channel")
+VALID_EVENT_TYPES = frozenset({"message", "reminder", "alert", "promotion", "system", "update", "email"})
+VALID_CHANNELS = frozenset({"push", "email", "sms", "in_app"})
+VALID_PRIORITY_HINTS = frozenset({"low", "medium", "high", "urgent"})
 
 
 class ValidationError(Exception):
@@ -17,6 +17,13 @@ class ValidationError(Exception):
     pass
 
 
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO-8601 timestamp, accepting a trailing 'Z' for UTC."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
 def validate_event(event: dict) -> dict:
     """
     Validate and normalize a notification event.
@@ -28,7 +35,7 @@ def validate_event(event: dict) -> dict:
 
     # Check required fields
     for field in REQUIRED_FIELDS:
-        if field not in event or not event[field]:
+        if not event.get(field):
             raise ValidationError(f"Missing required field: {field}")
 
     # Validate event_type
@@ -47,7 +54,7 @@ def validate_event(event: dict) -> dict:
 
     # Parse timestamp
     try:
-        ts = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
+        ts = _parse_iso(event["timestamp"])
     except (ValueError, AttributeError):
         raise ValidationError(f"Invalid timestamp format: {event['timestamp']}")
 
@@ -78,7 +85,7 @@ def validate_event(event: dict) -> dict:
     # Parse expires_at if provided
     if event.get("expires_at"):
         try:
-            exp = datetime.fromisoformat(event["expires_at"].replace("Z", "+00:00"))
+            exp = _parse_iso(event["expires_at"])
             normalized["expires_at"] = exp
         except (ValueError, AttributeError):
             raise ValidationError(f"Invalid expires_at format: {event['expires_at']}")
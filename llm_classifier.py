@@ -36,6 +36,45 @@ LATER_KEYWORDS = [
 ]
 
 
+def _compile_keywords(keywords: list[str]) -> re.Pattern:
+    """Join keywords into one alternation with a capture group per keyword."""
+    return re.compile("|".join(f"({kw})" for kw in keywords))
+
+
+# One scan per bucket instead of one re.search per keyword
+_URGENT_RE = _compile_keywords(URGENT_KEYWORDS)
+_PROMO_RE = _compile_keywords(PROMO_KEYWORDS)
+_LATER_RE = _compile_keywords(LATER_KEYWORDS)
+# Group numbers in _URGENT_RE of the resource-threshold keywords (95% / 100% / 99%)
+_THRESHOLD_GROUPS = frozenset(
+    i for i, kw in enumerate(URGENT_KEYWORDS, 1)
+    if kw in (r'\b95%\b', r'\b100%\b', r'\b99%\b')
+)
+
+# Literal substrings every keyword in the bucket requires; a text containing
+# none of them cannot match, so the regex scan is skipped
+_URGENT_ANCHORS = (
+    "otp", "password", "2fa", "verif", "down", "outage", "critical",
+    "emergency", "security", "breach", "fail", "expir", "blocked",
+    "unauthorized", "%", "overload", "crash", "error", "alert",
+)
+_PROMO_ANCHORS = (
+    "sale", "discount", "%", "flat", "promo", "coupon", "deal", "offer",
+    "free", "clearance", "limited",
+)
+_LATER_ANCHORS = (
+    "reminder", "submit", "update", "weekly", "monthly", "summary",
+    "digest", "newsletter", "report", "schedul",
+)
+
+
+def _keyword_hits(pattern: re.Pattern, anchors: tuple[str, ...], text: str) -> set[int]:
+    """Group numbers of the distinct keywords of pattern that occur in text."""
+    if not any(a in text for a in anchors):
+        return set()
+    return {m.lastindex for m in pattern.finditer(text)}
+
+
 class LLMClassifier:
     """Simulated LLM classifier with keyword heuristics and fail-safe fallback."""
 
@@ -74,9 +113,10 @@ class LLMClassifier:
         channel = event.get("channel", "")
 
         # Score urgent keywords
-        urgent_score = sum(1 for kw in URGENT_KEYWORDS if re.search(kw, text))
-        promo_score = sum(1 for kw in PROMO_KEYWORDS if re.search(kw, text))
-        later_score = sum(1 for kw in LATER_KEYWORDS if re.search(kw, text))
+        urgent_hits = _keyword_hits(_URGENT_RE, _URGENT_ANCHORS, text)
+        urgent_score = len(urgent_hits)
+        promo_score = len(_keyword_hits(_PROMO_RE, _PROMO_ANCHORS, text))
+        later_score = len(_keyword_hits(_LATER_RE, _LATER_ANCHORS, text))
 
         # Boost based on structured fields
         if priority == "urgent":
@@ -103,7 +143,7 @@ class LLMClassifier:
             label = "NOW"
             confidence = min(0.5 + (urgent_score / total) * 0.5, 0.99)
             explanation_code = "URGENT_KEYWORD" if urgent_score >= 2 else "LLM_DECISION"
-            reason = self._build_reason(label, text, urgent_score, event_type, priority)
+            reason = self._build_reason(text, urgent_score, urgent_hits, event_type, priority)
         elif promo_score > urgent_score and promo_score > later_score:
             label = "NEVER"
             confidence = min(0.5 + (promo_score / total) * 0.5, 0.99)
@@ -131,14 +171,17 @@ class LLMClassifier:
             "explanation_code": explanation_code,
         }
 
-    def _build_reason(self, label, text, score, event_type, priority):
-        """Build a human-readable reason string."""
+    def _build_reason(self, text, score, urgent_hits, event_type, priority):
+        """
+        Build a human-readable reason string. urgent_hits are the _URGENT_RE
+        groups already matched by _llm_classify, reused instead of rescanning.
+        """
         parts = []
         if "otp" in text:
             parts.append("contains OTP")
         if "down" in text:
             parts.append("service outage detected")
-        if any(re.search(kw, text) for kw in [r'\b95%\b', r'\b100%\b', r'\b99%\b']):
+        if not _THRESHOLD_GROUPS.isdisjoint(urgent_hits):
             parts.append("resource threshold critical")
         if priority == "urgent":
             parts.append("priority=urgent")
@@ -154,12 +197,7 @@ class LLMClassifier:
         event_type = event.get("event_type", "")
 
         # Fallback mapping
-        if priority in FALLBACK_MAP:
-            label = FALLBACK_MAP[priority]
-        elif event_type in FALLBACK_EVENT_TYPE_MAP:
-            label = FALLBACK_EVENT_TYPE_MAP[event_type]
-        else:
-            label = "LATER"
+        label = FALLBACK_MAP.get(priority) or FALLBACK_EVENT_TYPE_MAP.get(event_type, "LATER")
 
         return {
             "label": label,
@@ -3,14 +3,41 @@ Logger — structured explanation logging and console output.
 """
 
 import json
+import sys
+from collections import deque
 from datetime import datetime, timezone
 
+try:
+    import orjson
+except ImportError:  # stdlib fallback when orjson is not installed
+    orjson = None
+
+# Row layout for print_table: #, user, type, message, decision, code, rule
+_ROW_FMT = "{:<4} {:<6} {:<12} {:<35} {:<8} {:<25} {:<6}"
+
 
 class DecisionLogger:
-    """Accumulates structured decision logs and prints formatted output."""
+    """Accumulates structured decision logs and prints formatted output.
+
+    With a log_path, every entry is also appended to that file as one JSON
+    line and only the most recent max_entries are kept in memory.
+    """
 
-    def __init__(self):
-        self.logs: list[dict] = []
+    def __init__(self, log_path: str | None = None, max_entries: int | None = None):
+        self.log_path = log_path
+        self.logs: list[dict] | deque = (
+            deque(maxlen=max_entries) if log_path and max_entries else []
+        )
+        self._fh = open(log_path, "ab") if log_path else None
+
+    def _write(self, entries):
+        """Append entries to the JSON Lines sink."""
+        if orjson is not None:
+            data = b"".join(orjson.dumps(e, default=str) + b"\n" for e in entries)
+        else:
+            data = "".join(json.dumps(e, default=str, ensure_ascii=False) + "\n"
+                           for e in entries).encode("utf-8")
+        self._fh.write(data)
 
     def log(self, event: dict, decision: str, scheduled_time: str | None,
             explanation_code: str, reason: str, matched_rule_id: str | None = None,
@@ -30,13 +57,22 @@ class DecisionLogger:
             "raw_model_output": raw_model_output,
         }
         self.logs.append(entry)
+        if self._fh is not None:
+            self._write((entry,))
         return entry
 
+    def extend(self, entries: list[dict]):
+        """Store entries already built by another logger (e.g. a batch shard)."""
+        self.logs.extend(entries)
+        if self._fh is not None and entries:
+            self._write(entries)
+
     def get_output_record(self, event: dict, log_entry: dict) -> dict:
         """Build the final output record combining input + decision."""
-        # Build a clean input event (remove internal fields)
+        # Build a clean input event (remove internal and "_"-prefixed cache fields)
         clean_input = {k: v for k, v in event.items()
-                       if k not in ("parsed_timestamp", "event_id")}
+                       if k not in ("parsed_timestamp", "event_id")
+                       and not k.startswith("_")}
 
         return {
             "input_event": clean_input,
@@ -53,28 +89,49 @@ class DecisionLogger:
             print("No decisions logged.")
             return
 
-        # Header
-        print("\n" + "=" * 120)
-        print(f"{'#':<4} {'User':<6} {'Type':<12} {'Message (truncated)':<35} "
-              f"{'Decision':<8} {'Code':<25} {'Rule':<6}")
-        print("-" * 120)
-
-        for i, log in enumerate(self.logs, 1):
-            msg = log.get("reason", "")[:33]
-            print(
-                f"{i:<4} {log['user_id']:<6} {log['event_type']:<12} "
-                f"{msg:<35} {log['decision']:<8} "
-                f"{log['explanation_code']:<25} {log.get('matched_rule_id') or '-':<6}"
-            )
-
-        print("=" * 120 + "\n")
+        # Build every row first and emit the table in a single write
+        rule = "=" * 120
+        lines = [
+            "\n" + rule,
+            f"{'#':<4} {'User':<6} {'Type':<12} {'Message (truncated)':<35} "
+            f"{'Decision':<8} {'Code':<25} {'Rule':<6}",
+            "-" * 120,
+        ]
+        row = _ROW_FMT.format
+        lines.extend(
+            row(i, log["user_id"], log["event_type"], log.get("reason", "")[:33],
+                log["decision"], log["explanation_code"], log.get("matched_rule_id") or "-")
+            for i, log in enumerate(self.logs, 1)
+        )
+        lines.append(rule + "\n\n")
+        sys.stdout.write("\n".join(lines))
 
     def export_json(self, filepath: str = "output.json"):
-        """Export all logs to a JSON file."""
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(self.logs, f, indent=2, default=str)
+        """Export all logs held in memory to a JSON file."""
+        self.flush()
+        if orjson is not None:
+            # Datetimes go through default=str, as with json.dump below
+            with open(filepath, "wb") as f:
+                f.write(orjson.dumps(
+                    list(self.logs), default=str,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME,
+                ))
+        else:
+            with open(filepath, "w", encoding="utf-8") as f:
+                json.dump(list(self.logs), f, indent=2, default=str)
         print(f"[Logger] Exported {len(self.logs)} decisions to {filepath}")
 
+    def flush(self):
+        """Flush buffered lines to the log file, if any."""
+        if self._fh is not None:
+            self._fh.flush()
+
+    def close(self):
+        """Flush and close the log file, if any."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
     def clear(self):
-        """Clear all logs."""
+        """Clear the in-memory logs (the log file is append-only)."""
         self.logs.clear()
@@ -3,100 +3,180 @@ Rule Engine — loads, matches, and applies human-configurable JSON rules.
 """
 
 import json
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
+from config import RULE_MATCH_CACHE_SIZE
+
+# Event fields a rule can constrain to a list of allowed values. event_type is
+# not compiled: match() only scans the bucket for the event's own type, so
+# every candidate rule already accepts it.
+_LIST_FIELDS = ("priority_hint", "channel", "source")
+
+
+def _field_in(field: str, values):
+    """Predicate: the event's field is one of values (a frozenset when hashable)."""
+    try:
+        allowed = frozenset(values) if isinstance(values, (list, tuple)) else values
+    except TypeError:
+        allowed = values
+
+    def predicate(event: dict, hour: int) -> bool:
+        value = event.get(field)
+        try:
+            return value in allowed
+        except TypeError:
+            return value in values  # unhashable event value: plain list scan
+    return predicate
+
+
+def _in_time_window(tw: dict):
+    """Predicate: the event's hour falls in [start_hour, end_hour), wrapping midnight."""
+    start = tw.get("start_hour", 0)
+    end = tw.get("end_hour", 24)
+    wraps = start > end  # e.g. 22-6
+
+    def predicate(event: dict, hour: int) -> bool:
+        if wraps:
+            return hour >= start or hour < end
+        return start <= hour < end
+    return predicate
+
+
+def _event_types(match_cond: dict) -> tuple:
+    """The event_types a rule's match condition names; a scalar names just itself."""
+    types = match_cond.get("event_type", ())
+    return tuple(types) if isinstance(types, (list, tuple)) else (types,)
+
+
+def _allowed_count(values) -> int:
+    """Number of allowed values in a list condition (fewer rejects more events)."""
+    return len(values) if isinstance(values, (list, tuple)) else 0
+
+
+def _compile_rule(rule: dict) -> tuple:
+    """
+    Turn a rule's match conditions into a tuple of predicates called as
+    predicate(event, hour), cheapest and most selective first: set lookups
+    ordered by how few values they allow, then the time_window check.
+    """
+    match_cond = rule.get("match", {})
+    fields = sorted((f for f in _LIST_FIELDS if f in match_cond),
+                    key=lambda f: _allowed_count(match_cond[f]))
+    predicates = [_field_in(field, match_cond[field]) for field in fields]
+    if "time_window" in match_cond:
+        predicates.append(_in_time_window(match_cond["time_window"]))
+    return tuple(predicates)
+
+
+def _by_priority(rules) -> tuple:
+    """Immutable snapshot of rules, highest priority first."""
+    return tuple(sorted(rules, key=lambda r: r.get("priority", 0), reverse=True))
 
 
 class RuleEngine:
     """Loads JSON rule sets and matches events against them."""
 
     def __init__(self, rules_path: str = None, rules_data: list = None):
+        self._write_lock = threading.Lock()  # serializes reloads; match() never takes it
         if rules_data is not None:
-            self.rules = sorted(rules_data, key=lambda r: r.get("priority", 0), reverse=True)
+            self.rules = _by_priority(rules_data)
         elif rules_path:
             self.rules = self._load_rules(rules_path)
         else:
-            self.rules = []
+            self.rules = ()
+        self.build_index()
+
+    def build_index(self):
+        """
+        Compile every rule's conditions and partition the rules by the
+        event_types they constrain. Each bucket also holds the rules with no
+        event_type condition, kept in priority order, so match() only scans
+        rules that could apply to the event's type.
 
-    def _load_rules(self, path: str) -> list:
+        The buckets and a fresh match cache are published as one tuple, so a
+        concurrent match() sees either the old rule set or the new one.
+        """
+        rules = self.rules
+        compiled = [(r, r.get("id", "unknown"), r.get("action", {}), _compile_rule(r))
+                    for r in rules]
+        wildcard = [c for c in compiled if "event_type" not in c[0].get("match", {})]
+        event_types = {t for r in rules for t in _event_types(r.get("match", {}))}
+        by_type = {
+            t: [c for c in compiled
+                if "event_type" not in c[0].get("match", {}) or t in _event_types(c[0]["match"])]
+            for t in event_types
+        }
+        self._index = (by_type, wildcard, {})
+
+    def _load_rules(self, path: str) -> tuple:
         """Load rules from JSON file, sorted by priority descending."""
         try:
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             rules = data.get("rules", data) if isinstance(data, dict) else data
-            return sorted(rules, key=lambda r: r.get("priority", 0), reverse=True)
+            return _by_priority(rules)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"[RuleEngine] Warning: Could not load rules from {path}: {e}")
-            return []
+            return ()
 
     def reload(self, rules_path: str = None, rules_data: list = None):
-        """Reload rules from file or data."""
-        if rules_data is not None:
-            self.rules = sorted(rules_data, key=lambda r: r.get("priority", 0), reverse=True)
-        elif rules_path:
-            self.rules = self._load_rules(rules_path)
+        """Reload rules from file or data, swapping in an immutable snapshot."""
+        with self._write_lock:
+            if rules_data is not None:
+                self.rules = _by_priority(rules_data)
+            elif rules_path:
+                self.rules = self._load_rules(rules_path)
+            self.build_index()
 
     def match(self, event: dict) -> list[dict]:
         """
         Find all matching rules for an event, sorted by priority (highest first).
         Returns list of { "rule_id", "rule", "action" }.
         """
+        by_type, wildcard, cache = self._index  # one consistent rule set snapshot
+        candidates = by_type.get(event.get("event_type"), wildcard)
+
+        # Matching reads only these fields (and the hour), so events sharing
+        # them share a result; rule sets are small enough that few keys occur
+        ts = event.get("parsed_timestamp")
+        if ts is None:
+            ts = datetime.now(timezone.utc)
+        hour = ts.hour  # resolved once per event for every time_window check
+        key = (event.get("event_type"), event.get("priority_hint"),
+               event.get("channel"), event.get("source"), hour)
+        try:
+            cached = cache.get(key)
+        except TypeError:  # unhashable field value: match without the cache
+            return self._match(event, hour, candidates)
+        if cached is None:
+            cached = self._match(event, hour, candidates)
+            if len(cache) >= RULE_MATCH_CACHE_SIZE:
+                cache.clear()
+            cache[key] = cached
+        return list(cached)
+
+    @staticmethod
+    def _match(event: dict, hour: int, candidates: list) -> list[dict]:
+        """Evaluate the compiled candidate rules against the event at the given hour."""
         matches = []
-        for rule in self.rules:
-            if self._matches_rule(event, rule):
+        for rule, rule_id, action, predicates in candidates:
+            for predicate in predicates:
+                if not predicate(event, hour):
+                    break
+            else:
                 matches.append({
-                    "rule_id": rule.get("id", "unknown"),
+                    "rule_id": rule_id,
                     "rule": rule,
-                    "action": rule.get("action", {}),
+                    "action": action,
                 })
         return matches
 
-    def _matches_rule(self, event: dict, rule: dict) -> bool:
-        """Check if an event matches a rule's conditions."""
-        match_cond = rule.get("match", {})
-
-        # Match event_type
-        if "event_type" in match_cond:
-            if event.get("event_type") not in match_cond["event_type"]:
-                return False
-
-        # Match priority_hint
-        if "priority_hint" in match_cond:
-            if event.get("priority_hint") not in match_cond["priority_hint"]:
-                return False
-
-        # Match channel
-        if "channel" in match_cond:
-            if event.get("channel") not in match_cond["channel"]:
-                return False
-
-        # Match source
-        if "source" in match_cond:
-            if event.get("source") not in match_cond["source"]:
-                return False
-
-        # Match time_window (hour-based)
-        if "time_window" in match_cond:
-            tw = match_cond["time_window"]
-            ts = event.get("parsed_timestamp", datetime.now(timezone.utc))
-            hour = ts.hour
-            start = tw.get("start_hour", 0)
-            end = tw.get("end_hour", 24)
-
-            if start > end:
-                # Wraps midnight, e.g., 22-6
-                if not (hour >= start or hour < end):
-                    return False
-            else:
-                if not (start <= hour < end):
-                    return False
-
-        return True
-
     def apply_actions(self, event: dict, matched_rules: list, current_decision: str,
-                      history_store=None) -> dict:
+                      history_store=None, now: datetime | None = None) -> dict:
         """
-        Apply rule actions to modify the decision.
+        Apply rule actions to modify the decision. now is forwarded to
+        history queries (defaults to the current time).
         Returns {
             "decision": str,
             "explanation_code": str,
@@ -138,7 +218,7 @@ class RuleEngine:
             if "limit_per_day" in action and history_store:
                 limit = action["limit_per_day"]
                 count = history_store.count_event_type_today(
-                    event["user_id"], event["event_type"]
+                    event["user_id"], event["event_type"], now
                 )
                 if count >= limit:
                     result["decision"] = "NEVER"
@@ -10,13 +10,41 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from decision_engine import DecisionEngine
+from rule_engine import RuleEngine
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback when orjson is not installed
+    orjson = None
 
 
 def load_json(path: str) -> dict:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def dump_json(obj, path: str):
+    """Write obj as indented JSON; anything non-serializable goes through str()."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(
+                obj, default=str,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME,
+            ))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2, default=str)
+
+
+# One result row: index, user, event type, decision badge, explanation code, message
+ROW_FMT = "  {:>2}. [{:<3}] {:<10} │ {} │ {:<25} │ {}"
+# Color-coded decision badges, padded to a common width
+_BADGES = {"NOW": "🟢 NOW   ", "LATER": "🟡 LATER ", "NEVER": "🔴 NEVER "}
+
+
 def run_test_dataset(engine: DecisionEngine, events: list, label: str = "TEST DATASET"):
     """Run a batch of events and display results."""
     print(f"\n{'━' * 80}")
@@ -25,30 +53,25 @@ def run_test_dataset(engine: DecisionEngine, events: list, label: str = "TEST DA
 
     results = engine.process_batch(events)
 
-    # Print detailed results
+    # Print detailed results, buffered and emitted in a single write
+    lines = []
     for i, result in enumerate(results, 1):
         ev = result["input_event"]
         d = result["decision"]
+        badge = _BADGES.get(d) or f"   {d:<6}"
 
-        # Color-code decisions
-        if d == "NOW":
-            badge = "🟢 NOW   "
-        elif d == "LATER":
-            badge = "🟡 LATER "
-        elif d == "NEVER":
-            badge = "🔴 NEVER "
-        else:
-            badge = f"   {d:<6}"
-
-        msg = ev.get("message", "")[:45]
-        print(f"  {i:>2}. [{ev.get('user_id', '?'):<3}] {ev.get('event_type', '?'):<10} "
-              f"│ {badge} │ {result['explanation_code']:<25} │ {msg}")
+        lines.append(ROW_FMT.format(
+            i, ev.get("user_id", "?"), ev.get("event_type", "?"), badge,
+            result["explanation_code"], ev.get("message", "")[:45],
+        ))
 
         if result.get("scheduled_time"):
-            print(f"      ↳ scheduled: {result['scheduled_time']}")
+            lines.append(f"      ↳ scheduled: {result['scheduled_time']}")
         if result.get("matched_rule_id"):
-            print(f"      ↳ rule: {result['matched_rule_id']}")
+            lines.append(f"      ↳ rule: {result['matched_rule_id']}")
 
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
     return results
 
 
@@ -64,6 +87,9 @@ def main():
     test_events = test_data.get("test_events", [])
     stress_events = test_data.get("stress_test_events", [])
 
+    # Parse rules.json once and share the rule list across all scenario engines
+    rules_data = RuleEngine(rules_path=rules_path).rules
+
     simulate_failure = "--simulate-failure" in sys.argv
 
     # ── Scenario 1: Main test dataset ─────────────────────────────────
@@ -71,20 +97,20 @@ def main():
     print("  NOTIFICATION PRIORITIZATION ENGINE — NOW / LATER / NEVER")
     print("=" * 80)
 
-    engine = DecisionEngine(rules_path=rules_path, simulate_llm_failure=False)
+    engine = DecisionEngine(rules_data=rules_data, simulate_llm_failure=False)
     results_main = run_test_dataset(engine, test_events, "SCENARIO 1: Main Test Dataset (8 events)")
 
     # Print formatted table
     engine.logger.print_table()
 
     # ── Scenario 2: Stress test ───────────────────────────────────────
-    engine2 = DecisionEngine(rules_path=rules_path, simulate_llm_failure=False)
+    engine2 = DecisionEngine(rules_data=rules_data, simulate_llm_failure=False)
     results_stress = run_test_dataset(engine2, stress_events,
                                        "SCENARIO 2: Stress Test — 6 alerts to same user in 5 min")
     engine2.logger.print_table()
 
     # ── Scenario 3: LLM failure simulation ────────────────────────────
-    engine3 = DecisionEngine(rules_path=rules_path, simulate_llm_failure=True)
+    engine3 = DecisionEngine(rules_data=rules_data, simulate_llm_failure=True)
     results_fallback = run_test_dataset(engine3, test_events,
                                          "SCENARIO 3: LLM Failure — Fallback decisions")
     engine3.logger.print_table()
@@ -96,8 +122,7 @@ def main():
         "scenario_3_llm_failure": results_fallback,
     }
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(all_output, f, indent=2, default=str)
+    dump_json(all_output, output_path)
 
     print(f"\n✅ All decisions exported to: {output_path}")
     print(f"   Total decisions: {len(results_main) + len(results_stress) + len(results_fallback)}")
@@ -8,6 +8,15 @@ from config import (
     BASE_BACKOFF_MINUTES, DEFAULT_WORKING_HOUR,
 )
 
+_DEFAULT_DELAY = timedelta(minutes=15)
+_ONE_DAY = timedelta(days=1)
+# _QUIET_TABLE[hour] is True inside quiet hours (the window may wrap midnight)
+_QUIET_TABLE = tuple(
+    (h >= QUIET_HOUR_START or h < QUIET_HOUR_END) if QUIET_HOUR_START > QUIET_HOUR_END
+    else QUIET_HOUR_START <= h < QUIET_HOUR_END
+    for h in range(24)
+)
+
 
 def compute_scheduled_time(event: dict, explanation_code: str,
                            frequency_count: int = 0) -> str | None:
@@ -21,7 +30,9 @@ def compute_scheduled_time(event: dict, explanation_code: str,
     - Reminder → next working hour
     - Default → +15 minutes
     """
-    ts = event.get("parsed_timestamp", datetime.now(timezone.utc))
+    ts = event.get("parsed_timestamp")
+    if ts is None:
+        ts = datetime.now(timezone.utc)
     expires_at = event.get("expires_at")
 
     scheduled = None
@@ -32,7 +43,7 @@ def compute_scheduled_time(event: dict, explanation_code: str,
         if _is_quiet_hour(hour):
             scheduled = _next_morning(ts)
         else:
-            scheduled = ts + timedelta(minutes=15)
+            scheduled = ts + _DEFAULT_DELAY
 
     elif explanation_code == "FREQUENCY_LIMIT":
         # Exponential backoff based on how many events sent recently
@@ -45,7 +56,7 @@ def compute_scheduled_time(event: dict, explanation_code: str,
 
     else:
         # Default: 15 minutes delay
-        scheduled = ts + timedelta(minutes=15)
+        scheduled = ts + _DEFAULT_DELAY
 
     # Check expiration
     if expires_at and scheduled and scheduled > expires_at:
@@ -56,14 +67,12 @@ def compute_scheduled_time(event: dict, explanation_code: str,
 
 def _is_quiet_hour(hour: int) -> bool:
     """Check if the hour falls within quiet hours."""
-    if QUIET_HOUR_START > QUIET_HOUR_END:
-        return hour >= QUIET_HOUR_START or hour < QUIET_HOUR_END
-    return QUIET_HOUR_START <= hour < QUIET_HOUR_END
+    return _QUIET_TABLE[hour]
 
 
 def _next_morning(ts: datetime) -> datetime:
     """Return next day at QUIET_RESUME_HOUR."""
-    next_day = ts + timedelta(days=1)
+    next_day = ts + _ONE_DAY
     return next_day.replace(hour=QUIET_RESUME_HOUR, minute=0, second=0, microsecond=0)
 
 
@@ -72,5 +81,5 @@ def _next_working_hour(ts: datetime) -> datetime:
     if ts.hour < DEFAULT_WORKING_HOUR:
         return ts.replace(hour=DEFAULT_WORKING_HOUR, minute=0, second=0, microsecond=0)
     else:
-        next_day = ts + timedelta(days=1)
+        next_day = ts + _ONE_DAY
         return next_day.replace(hour=DEFAULT_WORKING_HOUR, minute=0, second=0, microsecond=0)
@@ -0,0 +1,293 @@
+"""Deterministic checks for the history indexes, edit distance, rule matching and email parsing."""
+import sys
+import os
+import random
+import email
+import email.utils
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta, timezone
+from history_store import HistoryStore, _count_keys, _urgent_keys
+from duplicate_detector import _myers_distance
+from rule_engine import RuleEngine
+from email_listener import EmailListener, _parse_date, _FETCH_HEADERS
+from config import MAX_EMAIL_BYTES
+
+NOW = datetime(2026, 2, 27, 12, 0, tzinfo=timezone.utc)
+
+print("=" * 60)
+print("  NOTIFICATION ENGINE — INTERNALS SELF-TEST")
+print("=" * 60)
+
+
+def make_record(minutes_ago: float, event_type: str, decision: str, source: str) -> dict:
+    return {
+        "event_type": event_type, "decision": decision, "source": source,
+        "parsed_timestamp": NOW - timedelta(minutes=minutes_ago),
+    }
+
+
+def check_indexes(store: HistoryStore, user_id: str):
+    """Every index holds exactly the records still in the ring buffer."""
+    records = list(store._store[user_id])
+    first_seq = store._seq[user_id] - len(records) + 1
+    with_seq = list(enumerate(records, start=first_seq))
+
+    timeline = store._timeline[user_id]
+    assert [(ts, seq) for ts, seq, _ in timeline] == sorted(
+        (r["parsed_timestamp"], seq) for seq, r in with_seq
+    ), "timeline out of sync"
+
+    expected_counts = {}
+    for seq, r in with_seq:
+        for key in _count_keys(r):
+            expected_counts.setdefault(key, []).append((r["parsed_timestamp"], seq))
+    assert dict(store._counts[user_id]) == {
+        k: sorted(v) for k, v in expected_counts.items()
+    }, "counts out of sync"
+
+    expected_urgent = {}
+    for seq, r in with_seq:
+        if r["decision"] == "NOW":
+            for key in _urgent_keys(r):
+                expected_urgent.setdefault(key, []).append((seq, r["parsed_timestamp"]))
+    assert {k: list(v) for k, v in store._urgent[user_id].items()} == expected_urgent, \
+        "urgent index out of sync"
+
+
+# ── Test 1: Ring-buffer eviction keeps every index in sync
+print("\n[1] HISTORY EVICTION — INDEXES MATCH THE RING BUFFER")
+rng = random.Random(7)
+store = HistoryStore(buffer_size=5)
+for i in range(200):
+    store.add("u1", make_record(
+        rng.uniform(0, 120), rng.choice(["alert", "email", "message"]),
+        rng.choice(["NOW", "LATER", "NEVER"]), f"src-{rng.randrange(40)}",
+    ))
+    check_indexes(store, "u1")
+print(f"  200 adds into a 5-slot buffer: {len(store._timeline['u1'])} timeline entries, "
+      f"{len(store._counts['u1'])} count keys, {len(store._urgent['u1'])} urgent keys")
+
+# ── Test 2: Window edges
+print("\n" + "=" * 60)
+print("[2] HISTORY WINDOWS — CUTOFF IS INCLUSIVE")
+store = HistoryStore(buffer_size=10)
+store.add("u1", make_record(10, "alert", "NOW", "ops"))          # exactly at a 10-min cutoff
+store.add("u1", make_record(10 + 1e-6 / 60, "alert", "NOW", "ops"))  # 1µs older
+store.add("u1", make_record(5, "email", "NOW", "boss"))
+store.add("u1", make_record(0, "email", "LATER", "boss"))          # exactly now
+cases = [
+    (store.count_in_window("u1", 10, NOW), 3),
+    (store.count_in_window("u1", 5, NOW), 2),
+    (store.count_in_window("u1", 0, NOW), 1),
+    (store.count_in_window("u2", 10, NOW), 0),
+    (store.count_urgent_by_source_or_type("u1", "alert", "nobody", 10, NOW), 1),
+    (store.count_urgent_by_source_or_type("u1", "alert", "boss", 10, NOW), 2),
+    (store.count_urgent_by_source_or_type("u1", "alert", "boss", 11, NOW), 3),
+    (store.count_urgent_by_source_or_type("u1", "email", "boss", 5, NOW), 1),
+    (store.count_urgent_by_source_or_type("u1", "email", "boss", 4, NOW), 0),
+]
+for got, expected in cases:
+    assert got == expected, (got, expected)
+print(f"  {len(cases)} window-edge counts match")
+
+# ── Test 3: Myers edit distance against the textbook DP
+print("\n" + "=" * 60)
+print("[3] MYERS DISTANCE — MATCHES REFERENCE DP")
+
+
+def reference_distance(s1: str, s2: str) -> int:
+    prev = list(range(len(s2) + 1))
+    for i, a in enumerate(s1, 1):
+        cur = [i]
+        for j, b in enumerate(s2, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a != b)))
+        prev = cur
+    return prev[-1]
+
+
+pairs = [("kitten", "sitting"), ("a", "b"), ("abc", ""), ("same", "same"),
+         ("server down", "server is down"), ("x" * 70, "x" * 69 + "y")]
+for _ in range(500):
+    s1 = "".join(rng.choice("abcd ") for _ in range(rng.randint(1, 80)))
+    s2 = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 80)))
+    pairs.append((s1, s2))
+for s1, s2 in pairs:
+    assert _myers_distance(s1, s2) == reference_distance(s1, s2), (s1, s2)
+print(f"  {len(pairs)} string pairs match")
+
+# ── Test 4: Rule matching
+print("\n" + "=" * 60)
+print("[4] RULE ENGINE — WILDCARD, WRAPPING WINDOW, CACHED KEYS, SCALAR TYPE")
+engine = RuleEngine(rules_data=[
+    {"id": "night", "priority": 50, "action": {},
+     "match": {"time_window": {"start_hour": 22, "end_hour": 6}}},
+    {"id": "urgent-any", "priority": 90, "action": {},
+     "match": {"priority_hint": ["urgent"]}},
+    {"id": "alert-push", "priority": 100, "action": {},
+     "match": {"event_type": ["alert"], "channel": ["push"]}},
+])
+
+
+def matched_ids(event_type, hour, priority_hint="low", channel="push"):
+    event = {"event_type": event_type, "priority_hint": priority_hint, "channel": channel,
+             "source": "ops", "parsed_timestamp": NOW.replace(hour=hour)}
+    return [m["rule_id"] for m in engine.match(event)]
+
+
+cases = [
+    (matched_ids("unknown", 12), []),
+    (matched_ids("unknown", 23), ["night"]),
+    (matched_ids("unknown", 5, "urgent"), ["urgent-any", "night"]),
+    (matched_ids("unknown", 6), []),
+    (matched_ids("unknown", 22), ["night"]),
+    (matched_ids("alert", 0), ["alert-push", "night"]),
+    (matched_ids("alert", 12, channel="email"), []),
+    (matched_ids("alert", 12, "urgent"), ["alert-push", "urgent-any"]),
+]
+# Same keys again come from the cache and must give the same answers
+cases += [(matched_ids("alert", 12, "urgent"), ["alert-push", "urgent-any"]),
+          (matched_ids("unknown", 23), ["night"])]
+for got, expected in cases:
+    assert got == expected, (got, expected)
+
+# Mutating a returned list must not leak into the cached result
+engine.match({"event_type": "alert", "channel": "push", "source": "ops",
+              "parsed_timestamp": NOW}).clear()
+assert matched_ids("alert", 12, None) == ["alert-push"]
+
+# Reloading publishes a fresh cache
+engine.reload(rules_data=[{"id": "only", "priority": 1, "action": {}, "match": {}}])
+assert matched_ids("alert", 12, "urgent") == ["only"]
+
+# A scalar event_type condition names one type, not one per character
+engine.reload(rules_data=[{"id": "scalar", "priority": 1, "action": {},
+                           "match": {"event_type": "alert"}}])
+assert matched_ids("alert", 12) == ["scalar"]
+assert matched_ids("a", 12) == []
+print(f"  {len(cases) + 4} match results correct")
+
+# ── Test 5: Email parsing
+print("\n" + "=" * 60)
+print("[5] EMAIL PARSING — BATCHED FETCH, TRUNCATION, HEADER FLOODS")
+
+messages = [
+    b"Received: from mx.example.com\r\n"
+    b"To: me@example.com\r\n"
+    b"Subject: Server down\r\n"
+    b"From: Ops <ops@example.com>\r\n"
+    b"Date: Fri, 27 Feb 2026 09:00:00 +0000\r\n"
+    b"Message-ID: <a1@example.com>\r\n"
+    b"\r\n"
+    b"srv-42 is unreachable.\r\n",
+    b"Subject: =?utf-8?q?Caf=C3=A9_invite?=\r\n"
+    b"From: boss@example.com\r\n"
+    b"Date: 27 Feb 2026 10:30:00 +0530\r\n"
+    b"Message-ID: <b2@example.com>\r\n"
+    b"Content-Type: multipart/alternative; boundary=XX\r\n"
+    b"\r\n"
+    b"--XX\r\nContent-Type: text/html\r\n\r\n<p>Lunch<br>at noon</p>\r\n"
+    b"--XX\r\nContent-Type: text/plain; charset=utf-8\r\n\r\nLunch at noon\r\n"
+    b"--XX--\r\n",
+    b"Subject: Newsletter\r\n"
+    b"From: news@example.com\r\n"
+    b"Date: Fri, 27 Feb 2026 11:00:00 -0800\r\n"
+    b"Message-ID: <c3@example.com>\r\n"
+    b"Content-Type: text/html; charset=utf-8\r\n"
+    b"Content-Transfer-Encoding: base64\r\n"
+    b"\r\n"
+    b"PGI+VG9wIHN0b3JpZXM8L2I+ICZhbXA7IG1vcmU=\r\n",
+]
+
+
+def fetch_response(uid: int, raw: bytes) -> list:
+    """imaplib's UID FETCH shape for one message: header and body literals, then b')'."""
+    head, _, body = raw.partition(b"\r\n\r\n")
+    wanted = tuple(f"{name}:".encode() for name in _FETCH_HEADERS.split())
+    fields = b"".join(line + b"\r\n" for line in head.split(b"\r\n")
+                      if line.upper().startswith(wanted)) + b"\r\n"
+    return [
+        (f"{uid} (UID {uid} BODY[HEADER.FIELDS ({_FETCH_HEADERS})] {{{len(fields)}}}".encode(),
+         fields),
+        (f" BODY[TEXT]<0> {{{len(body)}}}".encode(), body),
+        b")",
+    ]
+
+
+class CannedConnection:
+    """Answers UID FETCH with a canned response for the requested uids."""
+
+    def uid(self, command, uids, query):
+        assert command == "FETCH"
+        response = []
+        for uid in uids.split(b","):
+            response += fetch_response(int(uid), messages[int(uid) - 1])
+        return "OK", response
+
+
+listener = EmailListener("me@example.com", "unused")
+listener._connection = CannedConnection()
+batched = listener._fetch_batch([b"1", b"2", b"3"], "(unused)")
+one_by_one = [listener._parse_email(raw) for raw in messages]
+assert batched == one_by_one, (batched, one_by_one)
+assert [e["body"] for e in batched] == ["srv-42 is unreachable.", "Lunch at noon",
+                                        "Top stories & more"]
+assert batched[1]["subject"] == "Café invite"
+
+# A body cut short by MAX_EMAIL_BYTES parses like the same bytes through email.message_from_bytes
+raw = messages[0].replace(b"srv-42 is unreachable.", b"x" * (MAX_EMAIL_BYTES + 100))
+msg = EmailListener._parse_message(raw)
+reference = email.message_from_bytes(raw[:MAX_EMAIL_BYTES])
+assert msg.get_payload() == reference.get_payload()
+assert dict(msg.items()) == dict(reference.items())
+
+# A multipart body truncated mid-part (a partial FETCH) still yields its text part
+cut = messages[1][:messages[1].index(b"Lunch at noon") + len(b"Lunch")]
+assert listener._parse_email(cut)["body"] == "Lunch"
+
+# A header flooded with ';' keeps its parameters and body
+flood = (b"Subject: Flood\r\nFrom: x@example.com\r\n"
+         b"Content-Type: text/plain; charset=utf-8" + b";" * 200_000 + b"\r\n"
+         b"\r\nStill readable\r\n")
+flooded = listener._parse_email(flood)
+assert flooded["subject"] == "Flood" and flooded["body"] == "Still readable"
+assert EmailListener._parse_message(flood).get_content_charset() == "utf-8"
+print(f"  {len(batched)} batched messages match the per-message path; "
+      f"truncated and flooded messages parse")
+
+# ── Test 6: Date headers
+print("\n" + "=" * 60)
+print("[6] DATE HEADERS — MATCH parsedate_to_datetime")
+dates = [
+    "Fri, 27 Feb 2026 09:00:00 +0000",
+    "27 Feb 2026 09:00:00 +0000",          # no weekday
+    "Fri, 27 Feb 2026 09:00:00 +0530",
+    "Fri, 7 Feb 2026 23:59:59 -0800",      # single-digit day
+    "Fri, 27 Feb 2026 09:00:00 -0000",     # UTC, source zone unknown
+    "Fri, 27 Feb 2026 09:00:00 GMT",       # obsolete named zone
+    "Fri, 27 Feb 2026 09:00:00 EST",
+    "Fri, 27 Feb 2026 09:00:00",           # no zone: naive
+    "Fri, 27 Feb 26 09:00:00 +0000",       # two-digit year
+    "Fri, 27 Feb 2026 09:00 +0000",        # no seconds
+    "Fri,  27 Feb 2026 09:00:00 +0000",    # extra space
+]
+for date_str in dates:
+    got, expected = _parse_date(date_str), email.utils.parsedate_to_datetime(date_str)
+    assert got == expected and got.utcoffset() == expected.utcoffset(), (date_str, got, expected)
+
+# Invalid dates raise like parsedate_to_datetime; _parse_email then falls back to now
+for bad in ["not a date", "Fri, 31 Feb 2026 09:00:00 +0000", ""]:
+    try:
+        _parse_date(bad)
+    except (ValueError, TypeError):
+        pass
+    else:
+        raise AssertionError(bad)
+before = datetime.now(timezone.utc)
+stamped = listener._parse_email(b"Subject: x\r\nDate: not a date\r\n\r\nbody")["timestamp"]
+assert before <= datetime.fromisoformat(stamped) <= datetime.now(timezone.utc)
+print(f"  {len(dates)} dates match; invalid dates fall back to the current time")
+
+print("\n" + "=" * 60)
+print("  ✅ All tests passed successfully!")
+print("=" * 60)
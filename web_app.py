@@ -1,49 +1,157 @@
 import os
 import json
+import atexit
+import hashlib
 import time
 import threading
+from collections import deque
 from datetime import datetime, timezone
 from flask import Flask, render_template, jsonify, request
 
 # Import existing notification engine components
 from decision_engine import DecisionEngine
 from email_listener import EmailListener
+from config import (
+    DECISION_LOG_PATH,
+    IMAP_IDLE_TIMEOUT, IDLE_SAFETY_POLLS, POLL_BACKOFF_FACTOR, POLL_BACKOFF_MAX_SECONDS,
+)
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback when orjson is not installed
+    orjson = None
 
 app = Flask(__name__)
 
 # ── Global State ──────────────────────────────────────────────────────
-NOTIFICATIONS_FILE = "notifications.json"
-memory_notifications = []
+NOTIFICATIONS_FILE = "notifications.jsonl"        # append-only log, oldest first
+LEGACY_NOTIFICATIONS_FILE = "notifications.json"  # pre-JSONL array, newest first
+MAX_NOTIFICATIONS = 100  # newest-first history kept in memory (and after compaction, on disk)
+SAVE_DELAY_SECONDS = 2.0  # bursts of new notifications within this window share one save
+memory_notifications = deque(maxlen=MAX_NOTIFICATIONS)
+notifications_lock = threading.Lock()  # guards memory_notifications, _unsaved and _payload
+_unsaved = []     # records not yet appended to NOTIFICATIONS_FILE, oldest first
+_payload = None   # (json_bytes, etag) served by /api/notifications; None once stale
+_log_lines = 0    # records in NOTIFICATIONS_FILE; compacted past 2 * MAX_NOTIFICATIONS
+_save_lock = threading.Lock()  # one writer of NOTIFICATIONS_FILE at a time
+_save_pending = threading.Event()
 
 # Initialize Decision Engine
 base_dir = os.path.dirname(os.path.abspath(__file__))
 rules_path = os.path.join(base_dir, "rules.json")
-engine = DecisionEngine(rules_path=rules_path)
+engine = DecisionEngine(rules_path=rules_path,
+                        log_path=os.path.join(base_dir, DECISION_LOG_PATH))
+
+
+# ── JSON Files ────────────────────────────────────────────────────────
+def read_json_file(path: str):
+    """Parse a JSON file, with orjson when available."""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def json_line(obj) -> bytes:
+    """Serialize obj as one compact JSON Lines record."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME) + b"\n"
+    return (json.dumps(obj, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def parse_json_line(line: bytes):
+    """Parse one JSON Lines record, with orjson when available."""
+    return orjson.loads(line) if orjson is not None else json.loads(line)
 
 
 # ── Initialization ────────────────────────────────────────────────────
 def load_notifications():
-    """Load notifications from disk into memory."""
-    global memory_notifications
-    if os.path.exists(NOTIFICATIONS_FILE):
+    """Load the newest notifications from disk into memory."""
+    global memory_notifications, _log_lines
+    try:
+        if os.path.exists(NOTIFICATIONS_FILE):
+            tail = deque(maxlen=MAX_NOTIFICATIONS)
+            count = 0
+            with open(NOTIFICATIONS_FILE, "rb") as f:
+                for count, line in enumerate(f, 1):
+                    tail.append(line)
+            records = []
+            for line in tail:
+                try:
+                    records.append(parse_json_line(line))
+                except ValueError:
+                    pass  # e.g. a line torn by a crash mid-append
+            memory_notifications = deque(reversed(records), maxlen=MAX_NOTIFICATIONS)
+            _log_lines = count
+        elif os.path.exists(LEGACY_NOTIFICATIONS_FILE):
+            loaded = read_json_file(LEGACY_NOTIFICATIONS_FILE)
+            memory_notifications = deque(loaded[:MAX_NOTIFICATIONS], maxlen=MAX_NOTIFICATIONS)
+            compact_notifications()
+    except Exception as e:
+        print(f"Error loading notifications: {e}")
+        memory_notifications = deque(maxlen=MAX_NOTIFICATIONS)
+
+
+def compact_notifications(snapshot: list | None = None):
+    """Rewrite the log to hold just the in-memory notifications (newest-first snapshot)."""
+    global _log_lines
+    if snapshot is None:
+        with notifications_lock:
+            snapshot = list(memory_notifications)
+            _unsaved.clear()
+    tmp_path = NOTIFICATIONS_FILE + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(json_line(r) for r in reversed(snapshot)))
+    os.replace(tmp_path, NOTIFICATIONS_FILE)
+    _log_lines = len(snapshot)
+
+
+def save_notifications():
+    """Append notifications added since the last save, compacting a log that has grown."""
+    global _log_lines
+    _save_pending.clear()
+    with _save_lock:
+        with notifications_lock:
+            batch = _unsaved[:]
+            _unsaved.clear()
+            # Compacting writes memory as-is, which already holds the batch
+            snapshot = (list(memory_notifications)
+                        if _log_lines + len(batch) > 2 * MAX_NOTIFICATIONS else None)
         try:
-            with open(NOTIFICATIONS_FILE, "r", encoding="utf-8") as f:
-                memory_notifications = json.load(f)
+            if snapshot is not None:
+                compact_notifications(snapshot)
+            elif batch:
+                with open(NOTIFICATIONS_FILE, "ab") as f:
+                    f.write(b"".join(json_line(r) for r in batch))
+                _log_lines += len(batch)
         except Exception as e:
-            print(f"Error loading notifications: {e}")
-            memory_notifications = []
+            print(f"Error saving notifications: {e}")
 
 
-def save_notifications():
-    """Save the memory list to disk."""
-    try:
-        with open(NOTIFICATIONS_FILE, "w", encoding="utf-8") as f:
-            json.dump(memory_notifications, f, indent=2, default=str)
-    except Exception as e:
-        print(f"Error saving notifications: {e}")
+def schedule_save():
+    """Mark the notifications dirty; the saver thread writes them shortly after."""
+    _save_pending.set()
+
+
+def notification_saver():
+    """Coalesce save requests: write at most once per SAVE_DELAY_SECONDS."""
+    while True:
+        _save_pending.wait()
+        time.sleep(SAVE_DELAY_SECONDS)
+        save_notifications()
+
+
+def flush_pending_save():
+    """Write out a save that is still waiting on the debounce window."""
+    if _save_pending.is_set():
+        save_notifications()
 
 
 load_notifications()
+threading.Thread(target=notification_saver, daemon=True).start()
+atexit.register(flush_pending_save)
+atexit.register(engine.logger.close)
 
 
 # ── Core Processing ───────────────────────────────────────────────────
@@ -84,38 +192,56 @@ def process_classification(engine_result: dict) -> dict:
     return formatted_record
 
 
+def process_and_store_emails(emails: list[dict]) -> list[dict]:
+    """
+    Run a batch of emails (oldest first) through the engine and store the
+    results with one lock acquisition and one scheduled save.
+    """
+    notifications = [EmailListener.email_to_notification(e) for e in emails]
+    formatted = [process_classification(r) for r in engine.process_batch(notifications)]
+    engine.logger.flush()  # keep DECISION_LOG_PATH current between batches
+
+    # Store at the front (newest first); the deque drops the oldest past its maxlen
+    global _payload
+    with notifications_lock:
+        memory_notifications.extendleft(formatted)
+        _unsaved.extend(formatted)
+        _payload = None
+
+    if formatted:
+        schedule_save()
+    return formatted
+
+
 def process_and_store_email(email_data: dict):
     """Run an email through the engine and store the result."""
-    notification = EmailListener.email_to_notification(email_data)
-    result = engine.process_event(notification)
-    formatted = process_classification(result)
-    
-    # Store at the beginning of the list (newest first)
-    memory_notifications.insert(0, formatted)
-    
-    # Keep only the latest 100 for memory safety
-    if len(memory_notifications) > 100:
-        memory_notifications.pop()
-        
-    save_notifications()
-    return formatted
+    return process_and_store_emails([email_data])[0]
 
 
 # ── Background IMAP Thread ────────────────────────────────────────────
+_config_cache = {"mtime": None, "data": None}
+
+
 def load_config():
+    """Parse email_config.json, re-reading it only when its mtime changes."""
     config_path = os.path.join(base_dir, "email_config.json")
-    if not os.path.exists(config_path):
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except OSError:
         return None
+    if mtime == _config_cache["mtime"]:
+        return _config_cache["data"]
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        data = read_json_file(config_path)
     except Exception as e:
         print(f"Error reading config: {e}")
         return None
+    _config_cache["mtime"], _config_cache["data"] = mtime, data
+    return data
 
 
 def background_email_listener():
-    """Continuously poll Gmail based on configuration."""
+    """Continuously watch Gmail (IDLE push, or adaptive polling) based on configuration."""
     print("[Background Thread] Starting email monitor...")
     
     while True:
@@ -151,11 +277,16 @@ def background_email_listener():
                 print(f"[Background Thread] Found {len(recent_emails)} recent emails to process")
                 for eml in recent_emails:
                     print(f"[IMAP] Processing recent email: {eml.get('subject')}")
-                    process_and_store_email(eml)
+                process_and_store_emails(recent_emails)
             except Exception as e:
                 print(f"[Background Thread] Error fetching recent emails: {e}")
             
-            # Now start polling for new unread emails
+            # Now wait for new unread emails: pushed via IDLE when the server
+            # supports it, otherwise polled with a backoff while the inbox is quiet
+            use_idle = listener.supports_idle
+            if use_idle:
+                print("[Background Thread] Server supports IDLE; waiting for pushed mail.")
+            delay = poll_interval
             while True:
                 # Reload config inside loop to catch interval changes
                 config = load_config()
@@ -166,12 +297,22 @@ def background_email_listener():
                     emails = listener.fetch_unread()
                     for eml in emails:
                         print(f"[IMAP] New email received: {eml.get('subject')}")
-                        process_and_store_email(eml)
+                    process_and_store_emails(emails)
+                    if use_idle:
+                        # Re-check every few poll intervals even if nothing is pushed
+                        listener.idle(min(IMAP_IDLE_TIMEOUT, poll_interval * IDLE_SAFETY_POLLS))
+                        continue
                 except Exception as loop_e:
                     print(f"[IMAP] Fetch error: {loop_e}. Will reconnect.")
                     break # Break inner loop to trigger reconnect
-                    
-                time.sleep(poll_interval)
+
+                # New mail resets the interval; each empty poll stretches it
+                if emails:
+                    delay = poll_interval
+                else:
+                    delay = min(max(delay, poll_interval) * POLL_BACKOFF_FACTOR,
+                                max(poll_interval, POLL_BACKOFF_MAX_SECONDS))
+                time.sleep(delay)
                 
         except Exception as e:
             print(f"[Background Thread] Connection error: {e}. Retrying in {poll_interval}s...")
@@ -194,8 +335,31 @@ def index():
 
 @app.route("/api/notifications", methods=["GET"])
 def get_notifications():
-    """Return the list of processed notifications."""
-    return jsonify(memory_notifications)
+    """
+    Return the list of processed notifications. The serialized list is
+    reused until a new notification arrives, and its ETag lets polling
+    clients get a 304 when nothing changed.
+    """
+    global _payload
+    with notifications_lock:
+        if _payload is None:
+            snapshot = list(memory_notifications)
+            if orjson is not None:
+                body = orjson.dumps(snapshot, default=str)
+            else:
+                body = app.json.dumps(snapshot).encode("utf-8")
+            _payload = (body, hashlib.blake2b(body, digest_size=16).hexdigest())
+        body, etag = _payload
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+@app.route("/api/reload-rules", methods=["POST"])
+def reload_rules():
+    """Re-read rules.json; in-flight emails finish on the previous rule set."""
+    engine.reload_rules(rules_path=rules_path)
+    return jsonify({"success": True, "rules": len(engine.rules.rules)})
 
 
 @app.route("/api/simulate", methods=["POST"])